@@ -8,8 +8,9 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
 
 from app.core.config import get_settings
+from app.db.engine import connect_args
 from app.db.base import Base
-from app.models import user, chat, message  # noqa: F401  # ensure models are imported
+from app.models import user, chat, message, event  # noqa: F401  # ensure models are imported
 
 
 # this is the Alembic Config object, which provides
@@ -53,6 +54,7 @@ async def run_migrations_online() -> None:
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
+        connect_args=connect_args(settings),
     )
 
     async with connectable.connect() as connection:
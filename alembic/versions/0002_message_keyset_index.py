@@ -0,0 +1,29 @@
+"""message keyset pagination index
+
+Revision ID: 0002_message_keyset_index
+Revises: 0001_init
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_message_keyset_index'
+down_revision = '0001_init'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # (chat_id, created_at, id) serves both history pages and per-chat lookups,
+    # so the single-column chat_id index becomes redundant.
+    op.create_index('ix_message_chat_id_created_at_id', 'message', ['chat_id', 'created_at', 'id'])
+    op.drop_index('ix_message_chat_id', table_name='message')
+
+
+def downgrade() -> None:
+    op.create_index('ix_message_chat_id', 'message', ['chat_id'])
+    op.drop_index('ix_message_chat_id_created_at_id', table_name='message')
@@ -0,0 +1,55 @@
+"""denormalized chat last activity
+
+Revision ID: 0003_chat_last_activity
+Revises: 0002_message_keyset_index
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_chat_last_activity'
+down_revision = '0002_message_keyset_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('chat', sa.Column('last_message_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column('chat', sa.Column('last_activity_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_foreign_key(
+        'fk_chat_last_message_id_message', 'chat', 'message',
+        ['last_message_id'], ['id'], ondelete='SET NULL',
+    )
+
+    # Backfill from the newest message of every chat
+    op.execute(
+        """
+        UPDATE chat
+        SET last_message_id = latest.id, last_activity_at = latest.created_at
+        FROM (
+            SELECT DISTINCT ON (chat_id) chat_id, id, created_at
+            FROM message
+            ORDER BY chat_id, created_at DESC, id DESC
+        ) AS latest
+        WHERE chat.id = latest.chat_id
+        """
+    )
+
+    # (user_id, chat_id) covers everything the single-column user_id index did
+    op.create_index('ix_chatuser_user_id_chat_id', 'chatuser', ['user_id', 'chat_id'])
+    op.drop_index('ix_chatuser_user_id', table_name='chatuser')
+
+
+def downgrade() -> None:
+    op.create_index('ix_chatuser_user_id', 'chatuser', ['user_id'])
+    op.drop_index('ix_chatuser_user_id_chat_id', table_name='chatuser')
+
+    op.drop_constraint('fk_chat_last_message_id_message', 'chat', type_='foreignkey')
+    op.drop_column('chat', 'last_activity_at')
+    op.drop_column('chat', 'last_message_id')
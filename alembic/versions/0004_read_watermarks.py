@@ -0,0 +1,124 @@
+"""read watermarks and unread counters
+
+Revision ID: 0004_read_watermarks
+Revises: 0003_chat_last_activity
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_read_watermarks'
+down_revision = '0003_chat_last_activity'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # per-chat message sequence
+    op.add_column('message', sa.Column('seq', sa.BigInteger(), nullable=True))
+    op.execute(
+        """
+        UPDATE message
+        SET seq = numbered.rn
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY chat_id ORDER BY created_at, id) AS rn
+            FROM message
+        ) AS numbered
+        WHERE message.id = numbered.id
+        """
+    )
+    op.alter_column('message', 'seq', nullable=False)
+
+    op.add_column('chat', sa.Column('message_count', sa.BigInteger(), server_default=sa.text('0'), nullable=False))
+    op.execute(
+        """
+        UPDATE chat
+        SET message_count = counts.n
+        FROM (SELECT chat_id, max(seq) AS n FROM message GROUP BY chat_id) AS counts
+        WHERE chat.id = counts.chat_id
+        """
+    )
+
+    # last_message_id is now written before the message row exists (same transaction)
+    op.drop_constraint('fk_chat_last_message_id_message', 'chat', type_='foreignkey')
+    op.create_foreign_key(
+        'fk_chat_last_message_id_message', 'chat', 'message',
+        ['last_message_id'], ['id'], ondelete='SET NULL', deferrable=True, initially='DEFERRED',
+    )
+
+    # read watermarks
+    op.add_column('chatuser', sa.Column('last_read_seq', sa.BigInteger(), server_default=sa.text('0'), nullable=False))
+    op.add_column('chatuser', sa.Column('last_read_message_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column('chatuser', sa.Column('last_read_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_foreign_key(
+        'chatuser_last_read_message_id_fkey', 'chatuser', 'message',
+        ['last_read_message_id'], ['id'], ondelete='SET NULL',
+    )
+
+    # Compact receipts: the newest message a member has seen or written becomes their watermark
+    op.execute(
+        """
+        UPDATE chatuser
+        SET last_read_seq = w.seq, last_read_message_id = w.message_id, last_read_at = w.read_at
+        FROM (
+            SELECT DISTINCT ON (m.chat_id, r.user_id)
+                m.chat_id, r.user_id, m.seq, m.id AS message_id, r.read_at
+            FROM (
+                SELECT message_id, user_id, seen_at AS read_at FROM messageseen
+                UNION ALL
+                SELECT id, from_user_id, created_at FROM message
+            ) AS r
+            JOIN message m ON m.id = r.message_id
+            ORDER BY m.chat_id, r.user_id, m.seq DESC, r.read_at DESC
+        ) AS w
+        WHERE chatuser.chat_id = w.chat_id AND chatuser.user_id = w.user_id
+        """
+    )
+
+    op.drop_index('ix_messageseen_user_id', table_name='messageseen')
+    op.drop_index('ix_messageseen_message_id', table_name='messageseen')
+    op.drop_table('messageseen')
+
+
+def downgrade() -> None:
+    op.create_table(
+        'messageseen',
+        sa.Column('id', sa.Integer(), primary_key=True, nullable=False),
+        sa.Column('message_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('message.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('seen_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.UniqueConstraint('message_id', 'user_id', name='uq_message_seen_message_user'),
+    )
+    op.create_index('ix_messageseen_message_id', 'messageseen', ['message_id'])
+    op.create_index('ix_messageseen_user_id', 'messageseen', ['user_id'])
+
+    # Expand watermarks back into one receipt per message read by someone other than its author
+    op.execute(
+        """
+        INSERT INTO messageseen (message_id, user_id, seen_at)
+        SELECT m.id, cu.user_id, coalesce(cu.last_read_at, now())
+        FROM chatuser cu
+        JOIN message m ON m.chat_id = cu.chat_id AND m.seq <= cu.last_read_seq
+        WHERE m.from_user_id <> cu.user_id
+        """
+    )
+
+    op.drop_constraint('chatuser_last_read_message_id_fkey', 'chatuser', type_='foreignkey')
+    op.drop_column('chatuser', 'last_read_at')
+    op.drop_column('chatuser', 'last_read_message_id')
+    op.drop_column('chatuser', 'last_read_seq')
+
+    op.drop_constraint('fk_chat_last_message_id_message', 'chat', type_='foreignkey')
+    op.create_foreign_key(
+        'fk_chat_last_message_id_message', 'chat', 'message',
+        ['last_message_id'], ['id'], ondelete='SET NULL',
+    )
+
+    op.drop_column('chat', 'message_count')
+    op.drop_column('message', 'seq')
@@ -0,0 +1,35 @@
+"""websocket backplane spill table
+
+Revision ID: 0005_ws_backplane_events
+Revises: 0004_read_watermarks
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_ws_backplane_events'
+down_revision = '0004_read_watermarks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Holds events too large for a NOTIFY payload for a few seconds; no need for WAL
+    op.create_table(
+        'wsevent',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True, nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        prefixes=['UNLOGGED'],
+    )
+    op.create_index('ix_wsevent_created_at', 'wsevent', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_wsevent_created_at', table_name='wsevent')
+    op.drop_table('wsevent')
@@ -0,0 +1,108 @@
+"""trigram user search
+
+Revision ID: 0006_user_trigram_search
+Revises: 0005_ws_backplane_events
+Create Date: 2026-10-17 00:00:00.000000
+
+Written to run on a live user table without blocking logins or profile edits, like 0007:
+
+- search_name is added nullable without a default (catalog-only, a brief ACCESS EXCLUSIVE lock);
+- a trigger fills it for new rows and name changes from then on;
+- existing rows are backfilled in committed batches of BACKFILL_BATCH rows, walking the primary
+  key, each holding row locks on that batch only;
+- the trigram indexes are built, and the old lower() indexes dropped, CONCURRENTLY.
+
+For a million users expect the backfill and index builds to take a minute or two; prefix search
+keeps working on the old indexes until they are dropped at the end. If a concurrent build fails it
+leaves an INVALID index: drop it and rerun.
+"""
+from __future__ import annotations
+
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_user_trigram_search'
+down_revision = '0005_ws_backplane_events'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL_BATCH = 10_000
+
+_SEARCH_NAME = "lower(coalesce({row}first_name, '') || ' ' || coalesce({row}last_name, ''))"
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    op.add_column('user', sa.Column('search_name', sa.String(length=201), nullable=True))
+    op.execute(
+        f"""
+        CREATE FUNCTION user_search_name_update() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.search_name := {_SEARCH_NAME.format(row='NEW.')};
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    op.execute(
+        'CREATE TRIGGER user_search_name_update BEFORE INSERT OR UPDATE OF first_name, last_name ON "user" '
+        "FOR EACH ROW EXECUTE FUNCTION user_search_name_update()"
+    )
+
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        # Keyset over the primary key, as in 0007; rows behind the cursor are kept by the trigger
+        after = uuid.UUID(int=0)
+        while True:
+            after = conn.execute(
+                sa.text(
+                    f"""
+                    WITH batch AS (
+                        SELECT id FROM "user" WHERE id > :after ORDER BY id LIMIT :batch
+                    ), filled AS (
+                        UPDATE "user" SET search_name = {_SEARCH_NAME.format(row='')}
+                        FROM batch WHERE "user".id = batch.id AND "user".search_name IS NULL
+                    )
+                    SELECT id FROM batch ORDER BY id DESC LIMIT 1
+                    """
+                ),
+                {"after": after, "batch": BACKFILL_BATCH},
+            ).scalar()
+            if after is None:
+                break
+
+        op.create_index(
+            'ix_user_username_trgm',
+            'user',
+            [sa.text('lower(username) gin_trgm_ops')],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_user_search_name_trgm',
+            'user',
+            [sa.text('search_name gin_trgm_ops')],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+
+        # btree lower() indexes cannot serve LIKE under a non-C collation; search uses search_name now
+        op.drop_index('ix_user_last_name_lower', table_name='user', postgresql_concurrently=True)
+        op.drop_index('ix_user_first_name_lower', table_name='user', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_user_first_name_lower', 'user', [sa.text('lower(first_name)')], postgresql_concurrently=True)
+        op.create_index('ix_user_last_name_lower', 'user', [sa.text('lower(last_name)')], postgresql_concurrently=True)
+        op.drop_index('ix_user_search_name_trgm', table_name='user', postgresql_concurrently=True)
+        op.drop_index('ix_user_username_trgm', table_name='user', postgresql_concurrently=True)
+    op.execute('DROP TRIGGER user_search_name_update ON "user"')
+    op.execute('DROP FUNCTION user_search_name_update()')
+    op.drop_column('user', 'search_name')
@@ -0,0 +1,92 @@
+"""message full-text search
+
+Revision ID: 0007_message_full_text_search
+Revises: 0006_user_trigram_search
+Create Date: 2026-10-17 00:00:00.000000
+
+Written to run on a live, large message table without blocking chat traffic:
+
+- the column is added nullable without a default (catalog-only, a brief ACCESS EXCLUSIVE lock);
+- a trigger fills it for new and edited rows from then on;
+- existing rows are backfilled in committed batches of BACKFILL_BATCH rows, walking the primary
+  key (keyset, so each batch costs the same), each holding row locks on that batch only;
+- the (chat_id, search_vector) GIN index is built with CREATE INDEX CONCURRENTLY, which does not block writes.
+
+The backfill and the index build take time proportional to the table (expect minutes for ten
+million messages) but the app keeps working; search just finds older messages once their batch
+is done. If the concurrent build fails it leaves an INVALID index: drop it and rerun.
+"""
+from __future__ import annotations
+
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_message_full_text_search'
+down_revision = '0006_user_trigram_search'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = 10_000
+
+
+def upgrade() -> None:
+    # btree_gin lets chat_id sit in the GIN index, so search within a set of chats never reads other chats' hits
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    op.add_column('message', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(
+        """
+        CREATE FUNCTION message_search_vector_update() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.search_vector := to_tsvector('simple', coalesce(NEW.text_content, ''));
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER message_search_vector_update BEFORE INSERT OR UPDATE OF text_content ON message "
+        "FOR EACH ROW EXECUTE FUNCTION message_search_vector_update()"
+    )
+
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        # Walk the primary key in order, so each batch reads only its own index range; rows
+        # inserted behind the cursor already got their vector from the trigger.
+        after = uuid.UUID(int=0)
+        while True:
+            after = conn.execute(
+                sa.text(
+                    """
+                    WITH batch AS (
+                        SELECT id FROM message WHERE id > :after ORDER BY id LIMIT :batch
+                    ), filled AS (
+                        UPDATE message SET search_vector = to_tsvector('simple', coalesce(text_content, ''))
+                        FROM batch WHERE message.id = batch.id AND message.search_vector IS NULL
+                    )
+                    SELECT id FROM batch ORDER BY id DESC LIMIT 1
+                    """
+                ),
+                {"after": after, "batch": BACKFILL_BATCH},
+            ).scalar()
+            if after is None:
+                break
+        op.create_index(
+            'ix_message_chat_id_search_vector',
+            'message',
+            ['chat_id', 'search_vector'],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_message_chat_id_search_vector', table_name='message', postgresql_concurrently=True)
+    op.execute('DROP TRIGGER message_search_vector_update ON message')
+    op.execute('DROP FUNCTION message_search_vector_update()')
+    op.drop_column('message', 'search_vector')
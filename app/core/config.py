@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Literal, Optional
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -20,6 +21,12 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRES_MINUTES: int = 60
 
+    # Password hashing: bcrypt work factor and the bounded pool it runs in
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS: float = 2.0
+
     # Database
     DATABASE_URL: str | None = None
     POSTGRES_USER: str = "postgres"
@@ -27,6 +34,68 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = "itam_chat"
     POSTGRES_HOST: str = "db"
     POSTGRES_PORT: int = 5432
+    # Optional read replica for read-only endpoints. Users are pinned to the primary for
+    # PIN_SECONDS after they write; an unreachable replica is skipped for RETRY_SECONDS.
+    DATABASE_REPLICA_URL: str | None = None
+    REPLICA_PIN_SECONDS: float = 5.0
+    REPLICA_RETRY_SECONDS: float = 30.0
+    # Connection pool, per worker process (and per engine when a replica is configured)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # -1 keeps connections forever
+    # Ping on every checkout (one extra round-trip); recycling usually suffices
+    DB_POOL_PRE_PING: bool = True
+    # Server-side limits in milliseconds; 0 leaves the server default
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    DB_IDLE_IN_TRANSACTION_TIMEOUT_MS: int = 0
+    # asyncpg's per-connection prepared statement cache
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Connecting through PgBouncer in transaction pooling mode: no cached or named prepared statements
+    DB_PGBOUNCER: bool = False
+
+    # In-process cache of decoded tokens and user snapshots used by get_current_user
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_SIZE: int = 10_000
+
+    # In-process cache of confirmed (user, chat) memberships
+    MEMBERSHIP_CACHE_TTL_SECONDS: int = 60
+    MEMBERSHIP_CACHE_MAX_SIZE: int = 100_000
+
+    # Group commit for WebSocket messages: collect for up to WINDOW_MS or MAX_BATCH messages
+    MESSAGE_WRITER_ENABLED: bool = True
+    MESSAGE_WRITER_WINDOW_MS: float = 2.0
+    MESSAGE_WRITER_MAX_BATCH: int = 100
+
+    # Seen events for the same (chat, user) within this window are written and broadcast once
+    SEEN_COALESCE_WINDOW_MS: float = 50.0
+
+    # WebSocket fan-out across workers: "memory" (single process) or "postgres" (LISTEN/NOTIFY)
+    WS_BACKPLANE: Literal["memory", "postgres"] = "memory"
+    WS_BACKPLANE_CHANNEL: str = "itam_chat_events"
+    # Direct (non-PgBouncer) database URL for the LISTEN connection; defaults to the app's database
+    WS_BACKPLANE_DATABASE_URL: str | None = None
+    # Events waiting to be NOTIFYed to other workers; beyond this they are only delivered locally
+    WS_BACKPLANE_PUBLISH_QUEUE_SIZE: int = 10_000
+    # Presence: offline is announced only after GRACE_SECONDS without a connection (absorbs
+    # reconnects); last_seen is written for everyone active once per FLUSH_INTERVAL_SECONDS
+    PRESENCE_OFFLINE_GRACE_SECONDS: float = 10.0
+    PRESENCE_FLUSH_INTERVAL_SECONDS: float = 30.0
+    # Typing indicators: at most one broadcast per (user, chat) per INTERVAL_MS; clients hide
+    # the indicator after EXPIRES_MS without a newer one
+    TYPING_INTERVAL_MS: float = 3000.0
+    TYPING_EXPIRES_MS: int = 6000
+    # Per-connection outbound queue and what to do when a slow client fills it
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_SLOW_CONSUMER_POLICY: Literal["drop_oldest", "coalesce", "disconnect"] = "drop_oldest"
+
+    # Prometheus /metrics endpoint with request, SQL, pool and WebSocket instrumentation
+    METRICS_ENABLED: bool = True
+
+    # Per-request SQL profiler: X-DB-Query-Count / Server-Timing headers and logging of slow or N+1 requests
+    SQL_PROFILER_ENABLED: bool = False
+    SQL_PROFILER_SLOW_REQUEST_MS: float = 500.0
+    SQL_PROFILER_REPEAT_THRESHOLD: int = 5
 
     def database_url(self) -> str:
         if self.DATABASE_URL:
@@ -45,5 +114,8 @@ def get_settings() -> Settings:
 class PaginationParams(BaseModel):
     limit: int = Field(20, ge=1, le=100, description="Max items to return")
     offset: int = Field(0, ge=0, description="Offset for pagination")
+    with_total: Optional[Literal["exact", "estimate"]] = Field(
+        None, description="Also return `total`: an exact count, or a cheap planner estimate"
+    )
 
 
@@ -0,0 +1,50 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class HashingPoolBusy(Exception):
+    """The password hashing pool could not take the job within the queue timeout."""
+
+
+class HashingPool:
+    """Runs password hashing in a dedicated thread pool with admission control.
+
+    bcrypt releases the GIL while hashing, so threads give real parallelism without blocking
+    the event loop. At most `workers` hashes run at once; at most `max_pending` callers wait
+    for a slot, each for up to `queue_timeout` seconds, after which HashingPoolBusy is raised.
+    """
+
+    def __init__(self, workers: int, max_pending: int, queue_timeout: float) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.pending = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash")
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingPoolBusy()
+        self.pending += 1
+        try:
+            # Not wait_for: on 3.11 it can time out after acquire() has already taken a slot,
+            # leaking it. The timeout context cancels acquire() itself, which gives the slot back.
+            async with asyncio.timeout(self.queue_timeout):
+                await self._slots.acquire()
+        except TimeoutError:
+            self.rejected += 1
+            raise HashingPoolBusy() from None
+        finally:
+            self.pending -= 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
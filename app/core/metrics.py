@@ -0,0 +1,162 @@
+"""Prometheus metrics.
+
+Hot paths only touch pre-created metric objects (an increment or a histogram observation).
+Values that already live elsewhere (pool usage, socket counts, cache counters) are read by
+collectors at scrape time, so they cost nothing between scrapes.
+
+With several uvicorn workers each process keeps its own registry; scrape workers individually
+or run behind a single-worker-per-container layout.
+"""
+import time
+from typing import Any, Callable, Iterable
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+_FANOUT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+SQL_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds",
+    "SQL statement execution time (the _count series is the statement count)",
+    ["operation"],
+    buckets=_SQL_BUCKETS,
+)
+WS_BROADCAST_RECIPIENTS = Histogram(
+    "ws_broadcast_recipients",
+    "Local sockets an event was fanned out to",
+    buckets=_FANOUT_BUCKETS,
+)
+WS_BROADCAST_DURATION = Histogram(
+    "ws_broadcast_duration_seconds",
+    "Time to encode and enqueue an event for all local sockets",
+    buckets=_SQL_BUCKETS,
+)
+WS_INBOUND_EVENTS = Counter(
+    "ws_inbound_events",
+    "WebSocket frames received from clients by event type",
+    ["type"],
+)
+
+_SQL_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK"})
+_WS_EVENT_TYPES = frozenset({"message", "seen", "typing", "subscribe", "unsubscribe", "ping", "invalid"})
+
+
+def render() -> bytes:
+    return generate_latest(REGISTRY)
+
+
+def ws_event(event_type: Any) -> None:
+    """Count an inbound WebSocket event; unknown types share one label to bound cardinality."""
+    # `type` comes straight from the client frame and may be any JSON value, including unhashable ones
+    known = isinstance(event_type, str) and event_type in _WS_EVENT_TYPES
+    WS_INBOUND_EVENTS.labels(event_type if known else "unknown").inc()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency by route template (not raw path)."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        self._routes: dict[Any, str] = {}
+
+    def _route(self, scope: dict) -> str:
+        # The router stores the matched endpoint in the scope; map it back to its path template
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if not self._routes:
+            self._routes = {
+                getattr(r, "endpoint", None): r.path for r in scope["app"].routes if hasattr(r, "path")
+            }
+        return self._routes.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(scope["method"], self._route(scope), str(status)).observe(
+                time.perf_counter() - started
+            )
+
+
+def instrument_engine(engine: AsyncEngine, pool_prefix: str = "db_pool") -> None:
+    """Time every statement and expose the connection pool's state as `<pool_prefix>_*`."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        started = conn.info["metrics_started"].pop()
+        words = statement[:16].split(None, 1)
+        operation = words[0].upper() if words else ""
+        SQL_STATEMENT_DURATION.labels(operation if operation in _SQL_OPERATIONS else "OTHER").observe(
+            time.perf_counter() - started
+        )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context) -> None:
+        conn = context.connection
+        if conn is not None and conn.info.get("metrics_started"):
+            conn.info["metrics_started"].pop()
+
+    pool = sync_engine.pool
+    register_stats(
+        pool_prefix,
+        lambda: {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(0, pool.overflow()),
+            "checked_in": pool.checkedin(),
+        },
+    )
+
+
+class StatsCollector(Collector):
+    """Expose a `stats()`-style dict as metrics at scrape time: `<prefix>_<key>`.
+
+    Keys listed in `counters` are exported as counters (monotonic), the rest as gauges.
+    """
+
+    def __init__(self, prefix: str, source: Callable[[], dict[str, int]], counters: Iterable[str] = ()) -> None:
+        self.prefix = prefix
+        self.source = source
+        self.counters = frozenset(counters)
+
+    def collect(self):
+        for key, value in self.source().items():
+            name = f"{self.prefix}_{key}"
+            if key in self.counters:
+                yield CounterMetricFamily(name, f"{self.prefix} {key.replace('_', ' ')}", value=value)
+            else:
+                yield GaugeMetricFamily(name, f"{self.prefix} {key.replace('_', ' ')}", value=value)
+
+
+def register_stats(prefix: str, source: Callable[[], dict[str, int]], counters: Iterable[str] = ()) -> None:
+    REGISTRY.register(StatsCollector(prefix, source, counters))
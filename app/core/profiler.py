@@ -0,0 +1,176 @@
+"""Per-request SQL profiler.
+
+Engine hooks record every statement (normalized SQL, duration, row count) into the profile active
+in the current context. A profile is opened per request by ProfilerMiddleware (opt-in via
+SQL_PROFILER_ENABLED) or around any block with `capture()` / `query_budget()`; with neither active
+the hooks do a single context lookup per statement.
+
+The middleware reports each request's query count and DB time in `X-DB-Query-Count` and
+`Server-Timing` headers. It logs requests that are slow, or that run the same statement at least
+SQL_PROFILER_REPEAT_THRESHOLD times (the signature of an N+1 loop).
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?\b")
+_CAST = re.compile(r"::\w+(?: with(?:out)? time zone)?(?:\[\])?", re.IGNORECASE)
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|\?")
+_PARAM_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """Reduce a statement to its shape: literals and parameters become `?`, casts go, IN lists collapse."""
+    sql = _STRING.sub("?", statement)
+    sql = _CAST.sub("", sql)
+    sql = _PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PARAM_LIST.sub("?, ...", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+@dataclass
+class StatementRecord:
+    sql: str
+    duration: float
+    rows: int
+
+
+@dataclass
+class Profile:
+    statements: list[StatementRecord] = field(default_factory=list)
+    # Enclosing profile (e.g. a test's query_budget around a request's middleware profile); it sees these statements too
+    parent: Optional["Profile"] = None
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def db_time(self) -> float:
+        return sum(s.duration for s in self.statements)
+
+    def repeated(self, threshold: int = 2) -> dict[str, int]:
+        """Normalized statements executed at least `threshold` times."""
+        counts = Counter(s.sql for s in self.statements)
+        return {sql: n for sql, n in counts.most_common() if n >= threshold}
+
+
+_current: ContextVar[Optional[Profile]] = ContextVar("sql_profile", default=None)
+
+
+@contextmanager
+def capture() -> Iterator[Profile]:
+    """Record the statements executed in this block (and in requests it drives in-process)."""
+    profile = Profile(parent=_current.get())
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries: int, max_repeats: Optional[int] = None) -> Iterator[Profile]:
+    """Fail with AssertionError if the block runs more than `max_queries` statements, or any
+    single statement more than `max_repeats` times. For tests:
+
+        with query_budget(4, max_repeats=1):
+            client.get("/chats", headers=auth)
+    """
+    with capture() as profile:
+        yield profile
+    problems = []
+    if profile.count > max_queries:
+        problems.append(f"{profile.count} statements, budget {max_queries}")
+    if max_repeats is not None:
+        problems += [f"{n}x {sql}" for sql, n in profile.repeated(max_repeats + 1).items()]
+    if problems:
+        executed = "\n".join(f"  {s.duration * 1000:7.2f} ms  {s.rows:>5} rows  {s.sql}" for s in profile.statements)
+        raise AssertionError("Query budget exceeded: " + "; ".join(problems) + "\n" + executed)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        if _current.get() is not None:
+            conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        profile = _current.get()
+        started = conn.info.get("profiler_started")
+        if profile is None or not started:
+            return
+        record = StatementRecord(normalize(statement), time.perf_counter() - started.pop(), max(cursor.rowcount, 0))
+        while profile is not None:
+            profile.statements.append(record)
+            profile = profile.parent
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context) -> None:
+        conn = context.connection
+        if conn is not None and conn.info.get("profiler_started"):
+            conn.info["profiler_started"].pop()
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware opening a Profile per HTTP request."""
+
+    def __init__(self, app: Any, slow_request_ms: float, repeat_threshold: int) -> None:
+        self.app = app
+        self.slow_request = slow_request_ms / 1000
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+
+        with capture() as profile:
+
+            async def send_wrapper(message) -> None:
+                if message["type"] == "http.response.start":
+                    # Statements run after the headers are sent (streaming bodies) are not included
+                    db_ms = profile.db_time * 1000
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-db-query-count", str(profile.count).encode()),
+                        (b"server-timing", f'db;dur={db_ms:.2f};desc="{profile.count} queries"'.encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._report(scope, profile, time.perf_counter() - started)
+
+    def _report(self, scope: dict, profile: Profile, elapsed: float) -> None:
+        repeated = profile.repeated(self.repeat_threshold)
+        if elapsed < self.slow_request and not repeated:
+            return
+        lines = [
+            f"{scope['method']} {scope['path']}: {elapsed * 1000:.1f} ms, "
+            f"{profile.count} statements, {profile.db_time * 1000:.1f} ms in DB"
+        ]
+        lines += [f"  possible N+1: {n}x {sql[:300]}" for sql, n in repeated.items()]
+        if elapsed >= self.slow_request:
+            slowest = sorted(profile.statements, key=lambda s: s.duration, reverse=True)[:5]
+            lines += [f"  {s.duration * 1000:7.2f} ms  {s.rows:>5} rows  {s.sql[:300]}" for s in slowest]
+        logger.warning("\n".join(lines))
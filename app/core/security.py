@@ -5,21 +5,44 @@ from jose import jwt, JWTError
 from passlib.context import CryptContext
 
 from app.core.config import get_settings
+from app.core.hashing import HashingPool
 
 
-# Use bcrypt_sha256 to avoid bcrypt's 72-byte password limit while remaining bcrypt-compatible
-pwd_context = CryptContext(schemes=["bcrypt_sha256", "bcrypt"], deprecated="auto")
 settings = get_settings()
 
+# Use bcrypt_sha256 to avoid bcrypt's 72-byte password limit while remaining bcrypt-compatible.
+# Pinning min/max rounds to the configured work factor makes hashes with any other cost (and
+# legacy plain bcrypt hashes) report needs_update, so they are transparently rehashed on login.
+pwd_context = CryptContext(
+    schemes=["bcrypt_sha256", "bcrypt"],
+    deprecated="auto",
+    bcrypt_sha256__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt_sha256__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt_sha256__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
-def verify_password(plain_password: str, password_hash: str) -> bool:
-    return pwd_context.verify(plain_password, password_hash)
+hashing_pool = HashingPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS,
+)
 
 
 def get_password_hash(password: str) -> str:
+    """Hash on the calling thread, for scripts (bench.seed); the app uses hash_password."""
     return pwd_context.hash(password)
 
 
+async def verify_and_update_password(plain_password: str, password_hash: str) -> tuple[bool, Optional[str]]:
+    """Verify off the event loop. Returns (valid, new_hash); new_hash is set when a rehash is due."""
+    return await hashing_pool.run(pwd_context.verify_and_update, plain_password, password_hash)
+
+
+async def hash_password(password: str) -> str:
+    """Hash off the event loop."""
+    return await hashing_pool.run(pwd_context.hash, password)
+
+
 def create_access_token(subject: str, extra_claims: Optional[dict[str, Any]] = None) -> str:
     to_encode: dict[str, Any] = {"sub": subject}
     if extra_claims:
@@ -0,0 +1,32 @@
+import json
+from typing import Literal, Optional
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+TotalMode = Literal["exact", "estimate"]
+
+
+async def count_rows(db: AsyncSession, stmt: Select, mode: Optional[TotalMode]) -> Optional[int]:
+    """Total number of rows ``stmt`` would return (ignoring its ordering), or None when not requested.
+
+    ``exact`` runs ``count(*)`` over the statement. ``estimate`` asks the planner instead: a single
+    EXPLAIN with no execution, cheap regardless of table size but only as good as the table statistics.
+    """
+    if mode is None:
+        return None
+    stmt = stmt.order_by(None).limit(None).offset(None)
+    if mode == "exact":
+        res = await db.execute(select(func.count()).select_from(stmt.subquery()))
+        return int(res.scalar() or 0)
+
+    # EXPLAIN cannot take bind parameters through the driver, so the statement is inlined. Values are
+    # rendered by the dialect's literal processors (quoted/escaped), never by string formatting.
+    conn = await db.connection()
+    sql = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    res = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")
+    plan = res.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,53 @@
+import logging
+import uuid
+from typing import Any, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.core.config import Settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def connect_args(settings: Settings) -> dict[str, Any]:
+    """asyncpg connection arguments derived from settings (also used by Alembic)."""
+    if settings.DB_PGBOUNCER:
+        # Transaction pooling hands each transaction a different server connection, so prepared
+        # statements must be neither cached (asyncpg and SQLAlchemy each keep a cache) nor reused by
+        # name: unique names avoid "prepared statement already exists" on a shared server connection.
+        args: dict[str, Any] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+        if settings.DB_STATEMENT_TIMEOUT_MS or settings.DB_IDLE_IN_TRANSACTION_TIMEOUT_MS:
+            # PgBouncer rejects (or silently drops) these startup parameters; set them on the role instead
+            logger.warning(
+                "DB_STATEMENT_TIMEOUT_MS / DB_IDLE_IN_TRANSACTION_TIMEOUT_MS are not sent in PgBouncer mode; "
+                "use ALTER ROLE ... SET statement_timeout / idle_in_transaction_session_timeout"
+            )
+        return args
+
+    args = {"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    server_settings = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+    if settings.DB_IDLE_IN_TRANSACTION_TIMEOUT_MS:
+        server_settings["idle_in_transaction_session_timeout"] = str(settings.DB_IDLE_IN_TRANSACTION_TIMEOUT_MS)
+    if server_settings:
+        args["server_settings"] = server_settings
+    return args
+
+
+def create_engine(settings: Settings, url: Optional[str] = None) -> AsyncEngine:
+    """An engine for the app's database (or `url`, e.g. a replica) using the configured pool settings."""
+    return create_async_engine(
+        url or settings.database_url(),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args(settings),
+    )
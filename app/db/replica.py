@@ -0,0 +1,62 @@
+"""Read-replica routing state: who must read from the primary, and whether the replica is reachable.
+
+A user is pinned to the primary for REPLICA_PIN_SECONDS after any write they made, so they always
+read their own writes despite replication lag. The pin is kept in this process and, for REST
+writes, also handed to the client as a signed PIN_COOKIE, so whichever worker serves the next
+request honours it. A replica that fails to connect is skipped (per process) for
+REPLICA_RETRY_SECONDS.
+"""
+import hashlib
+import hmac
+import time
+import uuid
+from typing import Optional
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+
+
+settings = get_settings()
+
+PIN_COOKIE = "primary_pin"
+
+_pinned: TTLCache[uuid.UUID, bool] = TTLCache(maxsize=100_000, ttl=settings.REPLICA_PIN_SECONDS)
+_unavailable_until = 0.0
+# Own key, so a pin cookie is never a valid access token (or the other way round)
+_cookie_key = hashlib.sha256(b"replica-pin:" + settings.JWT_SECRET.encode()).digest()
+
+
+def pin(user_id: uuid.UUID) -> None:
+    _pinned.set(user_id, True)
+
+
+def is_pinned(user_id: uuid.UUID, cookie: Optional[str] = None) -> bool:
+    return bool(_pinned.get(user_id)) or (cookie is not None and _cookie_valid(cookie, user_id))
+
+
+def pin_cookie(user_id: uuid.UUID) -> str:
+    """`<user_id>.<expiry>.<hmac>`, valid for REPLICA_PIN_SECONDS and only for this user."""
+    body = f"{user_id}.{time.time() + settings.REPLICA_PIN_SECONDS:.3f}"
+    return f"{body}.{_sign(body)}"
+
+
+def _sign(body: str) -> str:
+    return hmac.new(_cookie_key, body.encode(), hashlib.sha256).hexdigest()
+
+
+def _cookie_valid(cookie: str, user_id: uuid.UUID) -> bool:
+    body, _, signature = cookie.rpartition(".")
+    owner, _, expiry = body.partition(".")
+    try:
+        return owner == str(user_id) and float(expiry) > time.time() and hmac.compare_digest(signature, _sign(body))
+    except ValueError:
+        return False
+
+
+def available() -> bool:
+    return time.monotonic() >= _unavailable_until
+
+
+def mark_unavailable() -> None:
+    global _unavailable_until
+    _unavailable_until = time.monotonic() + settings.REPLICA_RETRY_SECONDS
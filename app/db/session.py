@@ -1,23 +1,72 @@
-from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
+import math
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.core import metrics, profiler
 from app.core.config import get_settings
+from app.db import replica
+from app.db.engine import create_engine
 
 
 settings = get_settings()
 
-engine: AsyncEngine = create_async_engine(
-    settings.database_url(),
-    future=True,
-    pool_pre_ping=True,
-)
+engine: AsyncEngine = create_engine(settings)
+if settings.METRICS_ENABLED:
+    metrics.instrument_engine(engine)
+# Always hooked: a no-op unless a profile is active (SQL_PROFILER_ENABLED requests, query_budget in tests)
+profiler.instrument_engine(engine)
+
+
+class PrimarySession(Session):
+    """Session class for the primary, so write tracking does not apply to replica sessions."""
+
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     expire_on_commit=False,
+    sync_session_class=PrimarySession,
 )
 
+replica_engine: Optional[AsyncEngine] = None
+ReadSessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_engine(settings, settings.DATABASE_REPLICA_URL)
+    if settings.METRICS_ENABLED:
+        metrics.instrument_engine(replica_engine, pool_prefix="db_replica_pool")
+    profiler.instrument_engine(replica_engine)
+    ReadSessionLocal = async_sessionmaker(bind=replica_engine, expire_on_commit=False)
+
+    # Read-your-writes: a committed write pins the session's user (set by get_current_user, with the
+    # request's response) to the primary
+    @event.listens_for(PrimarySession, "after_flush")
+    def _flushed(session: Session, flush_context) -> None:
+        session.info["wrote"] = True
+
+    @event.listens_for(PrimarySession, "do_orm_execute")
+    def _executed(state: ORMExecuteState) -> None:
+        if state.is_insert or state.is_update or state.is_delete:
+            state.session.info["wrote"] = True
+
+    @event.listens_for(PrimarySession, "after_commit")
+    def _committed(session: Session) -> None:
+        user_id = session.info.get("user_id")
+        if session.info.pop("wrote", False) and user_id is not None:
+            replica.pin(user_id)
+            # The next request may land on another worker: the cookie carries the pin there
+            response = session.info.get("response")
+            if response is not None:
+                response.set_cookie(
+                    replica.PIN_COOKIE,
+                    replica.pin_cookie(user_id),
+                    max_age=math.ceil(settings.REPLICA_PIN_SECONDS),
+                    httponly=True,
+                    samesite="lax",
+                )
+
 
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
-
-
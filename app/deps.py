@@ -1,40 +1,81 @@
+import asyncio
+import logging
 import uuid
-from typing import Annotated
+from typing import Annotated, AsyncIterator
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import decode_token
+from app.db import replica, session as db_session
 from app.db.session import get_db
 from app.models.user import User
+from app.services import principal
 
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
 
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     db: Annotated[AsyncSession, Depends(get_db)],
+    response: Response,
 ) -> User:
-    try:
-        payload = decode_token(token)
-    except Exception:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-
-    sub = payload.get("sub")
-    if not sub:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token: no subject")
-    try:
-        user_id = uuid.UUID(sub)
-    except Exception:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid subject in token")
+    # Common case: token already decoded and user snapshot cached, no JWT work and no DB round-trip
+    user_id = principal.cached_subject(token)
+    if user_id is None:
+        try:
+            payload = decode_token(token)
+        except Exception:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+        sub = payload.get("sub")
+        if not sub:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token: no subject")
+        try:
+            user_id = uuid.UUID(sub)
+        except Exception:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid subject in token")
+        principal.remember_subject(token, user_id, payload)
+
+    # Writes committed through this request's session pin the user to the primary (see app.db.session)
+    db.info["user_id"] = user_id
+    db.info["response"] = response
+    user = principal.cached_user(user_id)
+    if user is not None:
+        return user
 
     res = await db.execute(select(User).where(User.id == user_id))
     user = res.scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    principal.remember_user(user)
     return user
 
 
+async def get_read_db(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> AsyncIterator[AsyncSession]:
+    """Session for read-only endpoints: the replica when one is configured, reachable, and the
+    user has not written recently (on this worker, or per their pin cookie); otherwise the
+    request's primary session."""
+    pinned = replica.is_pinned(current_user.id, request.cookies.get(replica.PIN_COOKIE))
+    if db_session.ReadSessionLocal is None or pinned or not replica.available():
+        yield db
+        return
+    async with db_session.ReadSessionLocal() as read_db:
+        try:
+            await read_db.connection()
+            reachable = True
+        except (OSError, DBAPIError, asyncio.TimeoutError):
+            logger.warning("Read replica unavailable; using the primary", exc_info=True)
+            replica.mark_unavailable()
+            reachable = False
+        yield read_db if reachable else db
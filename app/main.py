@@ -1,7 +1,36 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
+from app.core import metrics, profiler
+from app.core.config import get_settings
+from app.core.hashing import HashingPoolBusy
+from app.core.security import hashing_pool
+from app.realtime.manager import manager
+from app.realtime.presence import presence
+from app.realtime.typing_indicators import typing_indicators
+from app.routers.ws import seen_coalescer
+from app.services import membership, principal
+from app.services.message_writer import message_writer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await manager.start()
+    await presence.start()
+    if get_settings().MESSAGE_WRITER_ENABLED:
+        await message_writer.start()
+    yield
+    await message_writer.stop()
+    await seen_coalescer.stop()
+    await presence.stop()
+    await manager.stop()
+    hashing_pool.shutdown()
+
+
 app = FastAPI(
     title="ITAM Chat Backend",
     version="0.1.0",
@@ -10,6 +39,8 @@ app = FastAPI(
         "chat contents with pagination, and real-time messaging via WebSockets."
     ),
     openapi_version="3.0.3",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Respect X-Forwarded-* from Caddy to get correct scheme/host for URL generation
@@ -24,6 +55,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if get_settings().SQL_PROFILER_ENABLED:
+    app.add_middleware(
+        profiler.ProfilerMiddleware,
+        slow_request_ms=get_settings().SQL_PROFILER_SLOW_REQUEST_MS,
+        repeat_threshold=get_settings().SQL_PROFILER_REPEAT_THRESHOLD,
+    )
+
+if get_settings().METRICS_ENABLED:
+    # Outermost, so the recorded latency includes every other middleware
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.register_stats(
+        "ws", manager.stats, counters={"dropped_frames", "coalesced_frames", "slow_disconnects"}
+    )
+    metrics.register_stats(
+        "message_writer", lambda: {"batches": message_writer.batches, "messages": message_writer.messages},
+        counters={"batches", "messages"},
+    )
+    metrics.register_stats(
+        "auth_cache", principal.stats, counters={"token_hits", "token_misses", "user_hits", "user_misses"}
+    )
+    metrics.register_stats("membership_cache", membership.stats, counters={"hits", "misses"})
+    metrics.register_stats("presence", presence.stats, counters={"flushes"})
+    metrics.register_stats("typing", typing_indicators.stats, counters={"sent", "suppressed"})
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint() -> Response:
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
+@app.exception_handler(HashingPoolBusy)
+async def hashing_pool_busy_handler(request: Request, exc: HashingPoolBusy) -> ORJSONResponse:
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication is busy, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
 from app.routers.auth import router as auth_router
 from app.routers.search import router as search_router
 from app.routers.chats import router as chats_router
@@ -1,5 +1,8 @@
+# Loading policy: every relationship is declared with lazy="raise". Nothing is
+# eager-loaded implicitly and an accidental lazy load fails loudly instead of
+# issuing hidden queries; queries opt into the relations they need with
+# selectinload()/joinedload() or load_only() at the call site.
 from .user import User  # noqa: F401
 from .chat import Chat, ChatUser  # noqa: F401
-from .message import Message, MessageSeen  # noqa: F401
-
-
+from .message import Message  # noqa: F401
+from .event import WsEvent  # noqa: F401
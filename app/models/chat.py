@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Boolean, DateTime, ForeignKey, func
+from sqlalchemy import BigInteger, String, Boolean, DateTime, ForeignKey, Index, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -18,18 +18,39 @@ class Chat(Base):
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+    # Denormalized "last activity", maintained in the same transaction as every message insert
+    # (see app.services.messages.create_message) so listing chats never aggregates over messages.
+    # The FK is deferred so the chat row can be claimed (seq allocated) before the message is inserted.
+    last_message_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey(
+            "message.id",
+            ondelete="SET NULL",
+            use_alter=True,
+            name="fk_chat_last_message_id_message",
+            deferrable=True,
+            initially="DEFERRED",
+        ),
+        nullable=True,
+    )
+    last_activity_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Number of messages ever posted; also the seq of the newest message
+    message_count: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
+
     users = relationship(
         "User",
         secondary="chatuser",
         back_populates="chats",
-        lazy="selectin",
+        lazy="raise",
     )
 
     messages = relationship(
         "Message",
         back_populates="chat",
+        foreign_keys="Message.chat_id",
         cascade="all,delete-orphan",
-        lazy="selectin",
+        passive_deletes=True,
+        lazy="raise",
         order_by="desc(Message.created_at)",
     )
 
@@ -42,6 +63,19 @@ class ChatUser(Base):
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("user.id", ondelete="CASCADE"))
     joined_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+    # Read watermark: the member has read every message with seq <= last_read_seq.
+    # Unread count is Chat.message_count - last_read_seq; per-message receipts are derived from it.
+    last_read_seq: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
+    last_read_message_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("message.id", ondelete="SET NULL"), nullable=True
+    )
+    last_read_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
     # Optional backrefs are not necessary; relationships already defined on Chat and User
 
+    __table_args__ = (
+        # Range scan over a user's memberships (chat list, membership checks)
+        Index("ix_chatuser_user_id_chat_id", "user_id", "chat_id"),
+    )
+
 
@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class WsEvent(Base):
+    """Short-lived spill table for WebSocket events too large for a NOTIFY payload."""
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    payload: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
@@ -2,40 +2,48 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, DateTime, ForeignKey, func, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import BigInteger, String, DateTime, ForeignKey, Index, func
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
 
 
+# Text search configuration for message content. "simple" does no stemming, so it behaves the same
+# for every language our users write in; queries must use the same configuration.
+SEARCH_CONFIG = "simple"
+
+
 class Message(Base):
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
 
     chat_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("chat.id", ondelete="CASCADE"))
     from_user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("user.id", ondelete="CASCADE"))
+    # 1-based position within the chat, allocated from Chat.message_count; read watermarks compare against it
+    seq: Mapped[int] = mapped_column(BigInteger)
 
     text_content: Mapped[Optional[str]] = mapped_column(String(4000), nullable=True)
     image_content: Mapped[Optional[str]] = mapped_column(String(2048), nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
 
-    chat = relationship("Chat", back_populates="messages")
-    from_user = relationship("User")
-    seen_by = relationship("MessageSeen", back_populates="message", cascade="all,delete-orphan", lazy="selectin")
-
-
-class MessageSeen(Base):
-    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    message_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("message.id", ondelete="CASCADE"), index=True)
-    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("user.id", ondelete="CASCADE"), index=True)
-    seen_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # to_tsvector(SEARCH_CONFIG, text_content), set by the message_search_vector_update trigger
+    # (migration 0007) for full-text search; never loaded into the ORM
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR,
+        nullable=True,
+        deferred=True,
+        deferred_raiseload=True,
+    )
 
-    message = relationship("Message", back_populates="seen_by")
-    user = relationship("User")
+    chat = relationship("Chat", back_populates="messages", foreign_keys=[chat_id], lazy="raise")
+    from_user = relationship("User", lazy="raise")
 
     __table_args__ = (
-        UniqueConstraint("message_id", "user_id", name="uq_message_seen_message_user"),
+        # Serves history keyset pagination: WHERE chat_id = ? AND (created_at, id) < (?, ?)
+        Index("ix_message_chat_id_created_at_id", "chat_id", "created_at", "id"),
+        # Serves full-text search scoped to chats (btree_gin): WHERE chat_id = ? AND search_vector @@ ?
+        Index("ix_message_chat_id_search_vector", "chat_id", "search_vector", postgresql_using="gin"),
     )
-
-
+    # Fetch created_at via INSERT ... RETURNING instead of a follow-up SELECT
+    __mapper_args__ = {"eager_defaults": True}
@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Boolean, DateTime, func, Index
+from sqlalchemy import String, Boolean, DateTime, FetchedValue, func, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -19,6 +19,15 @@ class User(Base):
     first_name: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     last_name: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     avatar: Mapped[Optional[str]] = mapped_column(String(2048), nullable=True)
+    # "first last", lowercased; trigram-indexed for name search across both columns. Set by the
+    # user_search_name_update trigger (migration 0006); NULL only until that migration's backfill
+    # reaches the row
+    search_name: Mapped[Optional[str]] = mapped_column(
+        String(201),
+        nullable=True,
+        server_default=FetchedValue(),
+        server_onupdate=FetchedValue(),
+    )
 
     last_seen: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
@@ -31,13 +40,14 @@ class User(Base):
         "Chat",
         secondary="chatuser",
         back_populates="users",
-        lazy="selectin",
+        lazy="raise",
     )
 
     __table_args__ = (
         Index("ix_user_username_lower", func.lower(username), unique=True),
-        Index("ix_user_first_name_lower", func.lower(first_name)),
-        Index("ix_user_last_name_lower", func.lower(last_name)),
+        # pg_trgm GIN indexes serve LIKE prefix/substring matches and similarity (%, <%) search
+        Index("ix_user_username_trgm", text("lower(username) gin_trgm_ops"), postgresql_using="gin"),
+        Index("ix_user_search_name_trgm", text("search_name gin_trgm_ops"), postgresql_using="gin"),
     )
 
 
@@ -0,0 +1,218 @@
+"""Cross-worker fan-out for WebSocket events.
+
+Each worker publishes an event once and delivers it to its own sockets directly; the
+backplane carries it to every other worker, which deliver it to theirs.
+"""
+import asyncio
+import base64
+import logging
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import Settings
+from app.models.event import WsEvent
+
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[uuid.UUID, str], Awaitable[None]]
+
+
+class Backplane(ABC):
+    """Interface: `publish` forwards a serialized event; remote events arrive through `deliver`."""
+
+    @abstractmethod
+    async def start(self, deliver: Deliver) -> None: ...
+
+    @abstractmethod
+    async def stop(self) -> None: ...
+
+    @abstractmethod
+    async def publish(self, chat_id: uuid.UUID, data: str) -> None:
+        """Hand an event over for the other workers. Must not block the caller on I/O."""
+
+
+class InProcessBackplane(Backplane):
+    """Default for a single worker: it owns every socket, so there is nobody to forward to."""
+
+    async def start(self, deliver: Deliver) -> None:
+        return None
+
+    async def stop(self) -> None:
+        return None
+
+    async def publish(self, chat_id: uuid.UUID, data: str) -> None:
+        return None
+
+
+class PostgresBackplane(Backplane):
+    """Backplane over Postgres LISTEN/NOTIFY on the database we already run.
+
+    Notification format is ``<node>|<chat_id>|<kind>|<body>``. NOTIFY payloads must stay under
+    8000 bytes, so larger events are zlib-compressed (kind ``z``) and, if still too large,
+    spilled into the unlogged ``wsevent`` table and referenced by id (kind ``r``).
+
+    `publish` only enqueues. One publisher task drains the bounded queue over its own connection,
+    sending everything waiting in a single round-trip, so fan-out never waits for (or takes
+    connections from) the app's pool. When the queue is full, events are dropped for the other
+    workers (local delivery has already happened) and counted in `dropped`.
+    """
+
+    MAX_PAYLOAD_BYTES = 7900
+    MAX_PUBLISH_BATCH = 200
+    SPILL_RETENTION_SECONDS = 60
+    HEARTBEAT_SECONDS = 30
+
+    def __init__(self, engine: AsyncEngine, dsn: str, channel: str, max_pending: int = 10_000) -> None:
+        self.engine = engine
+        self.dsn = dsn
+        self.channel = channel
+        self.node_id = uuid.uuid4().hex[:12]
+        self.dropped = 0
+        self._deliver: Optional[Deliver] = None
+        self._inbox: asyncio.Queue[str] = asyncio.Queue()
+        self._outbox: asyncio.Queue[tuple[uuid.UUID, str]] = asyncio.Queue(maxsize=max_pending)
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        self._tasks = [
+            asyncio.create_task(self._listen_loop(), name="backplane-listen"),
+            asyncio.create_task(self._dispatch_loop(), name="backplane-dispatch"),
+            asyncio.create_task(self._publish_loop(), name="backplane-publish"),
+            asyncio.create_task(self._purge_loop(), name="backplane-purge"),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def publish(self, chat_id: uuid.UUID, data: str) -> None:
+        try:
+            self._outbox.put_nowait((chat_id, data))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning("Backplane publish queue full; %d events not forwarded so far", self.dropped)
+
+    async def _payload(self, conn, chat_id: uuid.UUID, data: str) -> str:
+        prefix = f"{self.node_id}|{chat_id}|"
+        if len(prefix) + 2 + len(data.encode()) <= self.MAX_PAYLOAD_BYTES:
+            return f"{prefix}j|{data}"
+        packed = base64.b64encode(zlib.compress(data.encode())).decode()
+        if len(prefix) + 2 + len(packed) <= self.MAX_PAYLOAD_BYTES:
+            return f"{prefix}z|{packed}"
+        spill_id = await conn.fetchval(f"INSERT INTO {WsEvent.__tablename__} (payload) VALUES ($1) RETURNING id", data)
+        return f"{prefix}r|{spill_id}"
+
+    async def _publish_loop(self) -> None:
+        import asyncpg
+
+        backoff = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                backoff = 1.0
+                while True:
+                    batch = [await self._outbox.get()]
+                    while len(batch) < self.MAX_PUBLISH_BATCH and not self._outbox.empty():
+                        batch.append(self._outbox.get_nowait())
+                    try:
+                        payloads = [await self._payload(conn, chat_id, data) for chat_id, data in batch]
+                        # One statement, one transaction: notifications keep this order on delivery.
+                        # (Postgres folds identical payloads within a transaction; those are duplicates anyway.)
+                        await conn.execute("SELECT pg_notify($1, p) FROM unnest($2::text[]) AS p", self.channel, payloads)
+                    except (OSError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError):
+                        logger.warning("Backplane publish failed; %d events not forwarded", len(batch))
+                        raise
+                    except Exception:
+                        logger.exception("Backplane publish failed; %d events not forwarded", len(batch))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Backplane publisher disconnected; retrying in %.0fs", backoff, exc_info=True)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:  # asyncpg listener signature
+        self._inbox.put_nowait(payload)
+
+    async def _dispatch_loop(self) -> None:
+        # A single consumer keeps events in NOTIFY order
+        while True:
+            payload = await self._inbox.get()
+            try:
+                node, chat_id, kind, body = payload.split("|", 3)
+                if node == self.node_id:
+                    continue
+                if kind == "z":
+                    body = zlib.decompress(base64.b64decode(body)).decode()
+                elif kind == "r":
+                    async with self.engine.connect() as conn:
+                        res = await conn.execute(select(WsEvent.payload).where(WsEvent.id == int(body)))
+                        body = res.scalar_one_or_none()
+                    if body is None:
+                        continue
+                await self._deliver(uuid.UUID(chat_id), body)
+            except Exception:
+                logger.exception("Dropping malformed backplane event")
+
+    async def _listen_loop(self) -> None:
+        import asyncpg
+
+        backoff = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _conn: lost.set())
+                await conn.add_listener(self.channel, self._on_notify)
+                backoff = 1.0
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=self.HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        await conn.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Backplane listener disconnected; retrying in %.0fs", backoff, exc_info=True)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _purge_loop(self) -> None:
+        # Separate from the listener: a failing DELETE must not cost the LISTEN connection
+        while True:
+            await asyncio.sleep(self.SPILL_RETENTION_SECONDS)
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.SPILL_RETENTION_SECONDS)
+            try:
+                async with self.engine.begin() as conn:
+                    await conn.execute(delete(WsEvent).where(WsEvent.created_at < cutoff))
+            except Exception:
+                logger.warning("Failed to purge spilled backplane events", exc_info=True)
+
+
+def create_backplane(settings: Settings, engine: AsyncEngine) -> Backplane:
+    if settings.WS_BACKPLANE == "postgres":
+        # LISTEN needs a session-level connection, which a transaction-pooling PgBouncer cannot provide
+        url = settings.WS_BACKPLANE_DATABASE_URL or settings.database_url()
+        dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresBackplane(engine, dsn, settings.WS_BACKPLANE_CHANNEL, settings.WS_BACKPLANE_PUBLISH_QUEUE_SIZE)
+    return InProcessBackplane()
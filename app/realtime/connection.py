@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import uuid
+from collections import deque
+from typing import Hashable, Literal, Optional
+
+from fastapi import WebSocket, status
+
+from app.realtime.frames import Frame, WireFormat
+
+
+logger = logging.getLogger(__name__)
+
+SlowConsumerPolicy = Literal["drop_oldest", "coalesce", "disconnect"]
+
+
+class OutboundStats:
+    """Counters shared by all connections of a manager."""
+
+    def __init__(self) -> None:
+        self.dropped = 0
+        self.coalesced = 0
+        self.slow_disconnects = 0
+
+
+class Connection:
+    """A client socket with its own bounded outbound queue drained by a dedicated writer task.
+
+    `send` never awaits, so a slow client only ever delays itself. When the queue is full the
+    policy decides: drop the oldest frame, replace a queued frame with the same coalesce key
+    (falling back to dropping the oldest), or close the socket with 1013 (try again later).
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int,
+        policy: SlowConsumerPolicy,
+        stats: OutboundStats,
+        wire_format: WireFormat = "json",
+        user_id: Optional[uuid.UUID] = None,
+    ) -> None:
+        self.websocket = websocket
+        self.user_id = user_id
+        self.wire_format = wire_format
+        self.max_queue = max_queue
+        self.policy = policy
+        self.stats = stats
+        self.closed = False
+        # Entries are [coalesce_key, data] lists so a coalesced frame can be replaced in place
+        self._queue: deque[list] = deque()
+        self._keyed: dict[Hashable, list] = {}
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._closer: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def send(self, frame: Frame, coalesce_key: Optional[Hashable] = None) -> bool:
+        """Enqueue a frame without blocking. Returns False if the frame was not queued."""
+        if self.closed:
+            return False
+        data = frame.encode(self.wire_format)
+        if len(self._queue) >= self.max_queue:
+            if self.policy == "disconnect":
+                self.stats.slow_disconnects += 1
+                self.abort(status.WS_1013_TRY_AGAIN_LATER)
+                return False
+            if self.policy == "coalesce" and coalesce_key is not None and coalesce_key in self._keyed:
+                self._keyed[coalesce_key][1] = data
+                self.stats.coalesced += 1
+                return True
+            dropped = self._queue.popleft()
+            if dropped[0] is not None and self._keyed.get(dropped[0]) is dropped:
+                del self._keyed[dropped[0]]
+            self.stats.dropped += 1
+        entry = [coalesce_key, data]
+        self._queue.append(entry)
+        if coalesce_key is not None:
+            self._keyed[coalesce_key] = entry
+        self._ready.set()
+        return True
+
+    def abort(self, code: int) -> None:
+        """Stop writing and close the socket in the background."""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        self._keyed.clear()
+        if self._writer is not None:
+            self._writer.cancel()
+        # Held on the connection so the task is not garbage-collected before the close frame goes out
+        self._closer = asyncio.create_task(self._close(code))
+
+    async def aclose(self) -> None:
+        """Stop the writer once the handler is done with the socket."""
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+        if self._closer is not None:
+            await asyncio.gather(self._closer, return_exceptions=True)
+
+    async def _close(self, code: int) -> None:
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), timeout=5)
+        except Exception:
+            pass
+
+    async def _write_loop(self) -> None:
+        while True:
+            if not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            entry = self._queue.popleft()
+            key, data = entry
+            if key is not None and self._keyed.get(key) is entry:
+                del self._keyed[key]
+            try:
+                if isinstance(data, bytes):
+                    await self.websocket.send_bytes(data)
+                else:
+                    await self.websocket.send_text(data)
+            except Exception:
+                # Broken socket: the receive loop will notice and release the connection
+                self.closed = True
+                self._queue.clear()
+                self._keyed.clear()
+                return
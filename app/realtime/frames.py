@@ -0,0 +1,87 @@
+"""WebSocket frame encoding.
+
+Two wire formats are negotiated per connection through the WebSocket subprotocol: JSON text frames
+(`itam.json.v1`, also used when the client offers none) and MessagePack binary frames
+(`itam.msgpack.v1`). Both carry the same event objects. permessage-deflate is negotiated separately
+by the server and applies to either format.
+
+An event is encoded once per format no matter how many sockets receive it: `Frame` holds the JSON
+text and converts it to MessagePack on first use. Frames that never change are built at import time.
+"""
+import uuid
+from typing import Any, Literal, Optional, Sequence
+
+import msgpack
+import orjson
+
+from app.schemas.message import MessageOut
+
+
+WireFormat = Literal["json", "msgpack"]
+
+SUBPROTOCOLS: dict[str, WireFormat] = {
+    "itam.json.v1": "json",
+    "itam.msgpack.v1": "msgpack",
+}
+
+
+def negotiate(offered: Sequence[str]) -> tuple[Optional[str], WireFormat]:
+    """Pick the first subprotocol the client offered that we speak; plain JSON when none match."""
+    for name in offered:
+        if name in SUBPROTOCOLS:
+            return name, SUBPROTOCOLS[name]
+    return None, "json"
+
+
+class Frame:
+    __slots__ = ("json", "_msgpack")
+
+    def __init__(self, json: str) -> None:
+        self.json = json
+        self._msgpack: Optional[bytes] = None
+
+    def encode(self, fmt: WireFormat) -> str | bytes:
+        if fmt == "json":
+            return self.json
+        if self._msgpack is None:
+            self._msgpack = msgpack.packb(orjson.loads(self.json))
+        return self._msgpack
+
+
+def dumps(payload: dict[str, Any]) -> str:
+    # UTC datetimes as "...Z", the way the REST responses (pydantic) render them
+    return orjson.dumps(payload, option=orjson.OPT_UTC_Z).decode()
+
+
+def event(payload: dict[str, Any]) -> Frame:
+    return Frame(dumps(payload))
+
+
+def decode(data: str | bytes) -> Any:
+    """Decode an inbound frame: text frames are JSON, binary frames are MessagePack."""
+    if isinstance(data, bytes):
+        return msgpack.unpackb(data)
+    return orjson.loads(data)
+
+
+def error(message: str) -> Frame:
+    return event({"type": "error", "error": message})
+
+
+PONG = event({"type": "pong"})
+ERROR_INVALID_JSON = error("Invalid JSON")
+ERROR_CONTENT_REQUIRED = error("text_content or image_content required")
+ERROR_NOT_STORED = error("Message could not be stored")
+ERROR_CHAT_ID_REQUIRED = error("chat_id is required")
+ERROR_NOT_MEMBER = error("Not a member of chat")
+ERROR_NOT_SUBSCRIBED = error("Not subscribed to chat")
+ERROR_UNKNOWN_EVENT = error("Unknown event type")
+
+
+def message_event(message: Any, chat_id: Optional[uuid.UUID] = None) -> Frame:
+    """Encode a stored Message as a `message` event frame."""
+    # pydantic-core writes the JSON directly (same output as the REST endpoints); the envelope is spliced around it
+    body = MessageOut.model_validate(message).model_dump_json()
+    if chat_id is None:
+        return Frame(f'{{"type":"message","message":{body}}}')
+    return Frame(f'{{"type":"message","chat_id":"{chat_id}","message":{body}}}')
@@ -0,0 +1,173 @@
+import time
+import uuid
+from typing import Any, Hashable, Iterable, Optional
+
+import orjson
+from fastapi import WebSocket
+
+from app.core import metrics
+from app.core.config import get_settings
+from app.db.session import engine
+from app.realtime import frames
+from app.realtime.backplane import Backplane, InProcessBackplane, create_backplane
+from app.realtime.connection import Connection, OutboundStats, SlowConsumerPolicy
+from app.realtime.frames import Frame
+
+# Backplane channel for events addressed to several chats at once (see broadcast_to_chats)
+MULTI_CHAT_CHANNEL = uuid.UUID(int=0)
+
+
+class ChatConnectionManager:
+    def __init__(
+        self,
+        backplane: Optional[Backplane] = None,
+        max_queue: int = 256,
+        policy: SlowConsumerPolicy = "drop_oldest",
+    ) -> None:
+        self.chat_connections: dict[uuid.UUID, set[Connection]] = {}
+        self.connections: set[Connection] = set()
+        self.backplane = backplane or InProcessBackplane()
+        self.max_queue = max_queue
+        self.policy = policy
+        self.outbound = OutboundStats()
+
+    async def start(self) -> None:
+        await self.backplane.start(self.deliver_local)
+
+    async def stop(self) -> None:
+        await self.backplane.stop()
+
+    async def accept(self, websocket: WebSocket, user_id: Optional[uuid.UUID] = None) -> Connection:
+        subprotocol, wire_format = frames.negotiate(websocket.scope.get("subprotocols", ()))
+        await websocket.accept(subprotocol=subprotocol)
+        conn = Connection(websocket, self.max_queue, self.policy, self.outbound, wire_format, user_id)
+        conn.start()
+        self.connections.add(conn)
+        return conn
+
+    async def connect(
+        self, chat_id: uuid.UUID, websocket: WebSocket, user_id: Optional[uuid.UUID] = None
+    ) -> Connection:
+        conn = await self.accept(websocket, user_id)
+        self.subscribe(chat_id, conn)
+        return conn
+
+    async def release(self, conn: Connection) -> None:
+        """Forget a connection whose receive loop has ended."""
+        self.unsubscribe_all(conn)
+        self.connections.discard(conn)
+        await conn.aclose()
+
+    def subscribe(self, chat_id: uuid.UUID, conn: Connection) -> None:
+        self.chat_connections.setdefault(chat_id, set()).add(conn)
+
+    def is_subscribed(self, chat_id: uuid.UUID, conn: Connection) -> bool:
+        return conn in self.chat_connections.get(chat_id, ())
+
+    def disconnect(self, chat_id: uuid.UUID, conn: Connection) -> None:
+        conns = self.chat_connections.get(chat_id)
+        if conns and conn in conns:
+            conns.remove(conn)
+            if not conns:
+                self.chat_connections.pop(chat_id, None)
+
+    def unsubscribe_all(self, conn: Connection) -> None:
+        for chat_id, conns in list(self.chat_connections.items()):
+            if conn in conns:
+                conns.remove(conn)
+                if not conns:
+                    self.chat_connections.pop(chat_id, None)
+
+    async def broadcast(
+        self, chat_id: uuid.UUID, message: dict[str, Any] | Frame, coalesce_key: Optional[Hashable] = None
+    ) -> None:
+        """Deliver to this worker's sockets and publish once for the other workers.
+
+        `message` may be an already encoded frame; either way it is encoded once per wire format.
+        """
+        frame = message if isinstance(message, Frame) else frames.event(message)
+        self.enqueue(chat_id, frame, coalesce_key)
+        # The backplane always carries JSON; receiving workers re-encode for their own sockets
+        await self.backplane.publish(chat_id, frame.json)
+
+    async def broadcast_to_chats(
+        self,
+        chat_ids: Iterable[uuid.UUID],
+        message: dict[str, Any] | Frame,
+        exclude_user: Optional[uuid.UUID] = None,
+        coalesce_key: Optional[Hashable] = None,
+    ) -> None:
+        """Deliver one frame to every socket subscribed to any of `chat_ids`, once per socket.
+
+        Sockets of `exclude_user` are skipped. The other workers get a single backplane event that
+        lists the chats, and deduplicate for their own sockets the same way.
+        """
+        chat_ids = list(chat_ids)
+        if not chat_ids:
+            return
+        frame = message if isinstance(message, Frame) else frames.event(message)
+        self.enqueue_once(chat_ids, frame, exclude_user, coalesce_key)
+        envelope = {"chats": chat_ids, "exclude": exclude_user, "frame": frame.json}
+        await self.backplane.publish(MULTI_CHAT_CHANNEL, frames.dumps(envelope))
+
+    async def deliver_local(self, chat_id: uuid.UUID, data: str) -> None:
+        if chat_id == MULTI_CHAT_CHANNEL:
+            envelope = orjson.loads(data)
+            exclude = envelope["exclude"]
+            self.enqueue_once(
+                [uuid.UUID(c) for c in envelope["chats"]],
+                Frame(envelope["frame"]),
+                uuid.UUID(exclude) if exclude else None,
+            )
+            return
+        self.enqueue(chat_id, Frame(data))
+
+    def enqueue(self, chat_id: uuid.UUID, frame: Frame, coalesce_key: Optional[Hashable] = None) -> None:
+        # Non-blocking: each connection's writer task drains its own queue
+        started = time.perf_counter()
+        conns = list(self.chat_connections.get(chat_id, ()))
+        for conn in conns:
+            if conn.closed:
+                self.disconnect(chat_id, conn)
+                continue
+            conn.send(frame, coalesce_key)
+        metrics.WS_BROADCAST_RECIPIENTS.observe(len(conns))
+        metrics.WS_BROADCAST_DURATION.observe(time.perf_counter() - started)
+
+    def enqueue_once(
+        self,
+        chat_ids: list[uuid.UUID],
+        frame: Frame,
+        exclude_user: Optional[uuid.UUID] = None,
+        coalesce_key: Optional[Hashable] = None,
+    ) -> None:
+        started = time.perf_counter()
+        conns: set[Connection] = set()
+        for chat_id in chat_ids:
+            conns.update(self.chat_connections.get(chat_id, ()))
+        for conn in conns:
+            if conn.closed or (exclude_user is not None and conn.user_id == exclude_user):
+                continue
+            conn.send(frame, coalesce_key)
+        metrics.WS_BROADCAST_RECIPIENTS.observe(len(conns))
+        metrics.WS_BROADCAST_DURATION.observe(time.perf_counter() - started)
+
+    def stats(self) -> dict[str, int]:
+        depths = [c.depth for c in self.connections]
+        return {
+            "connections": len(self.connections),
+            "subscriptions": sum(len(conns) for conns in self.chat_connections.values()),
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_frames": self.outbound.dropped,
+            "coalesced_frames": self.outbound.coalesced,
+            "slow_disconnects": self.outbound.slow_disconnects,
+        }
+
+
+_settings = get_settings()
+manager = ChatConnectionManager(
+    create_backplane(_settings, engine),
+    max_queue=_settings.WS_SEND_QUEUE_SIZE,
+    policy=_settings.WS_SLOW_CONSUMER_POLICY,
+)
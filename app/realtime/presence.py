@@ -0,0 +1,162 @@
+"""Who is online, from the WebSocket connections themselves.
+
+Connect, ping and disconnect update an in-memory registry; nothing is written per event. Peers in
+the user's chats get one `presence` event, however many chats they share, when the user comes
+online or goes offline. Going offline is delayed by `offline_grace_seconds`, so a client that
+drops and reconnects (network switch, page reload) does not flap. `user.last_seen` is persisted every `flush_interval_seconds` with one
+batched UPDATE for everyone seen since the previous flush.
+
+State is per worker process: with several workers, a user connected to two of them is reported
+offline by the one they leave first.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import DateTime, Uuid, column, func, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.db.session import AsyncSessionLocal
+from app.models.user import User
+from app.realtime import frames
+from app.realtime.manager import manager
+from app.services import principal
+
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_ROWS = 1_000
+
+
+async def write_last_seen(db: AsyncSession, seen: dict[uuid.UUID, datetime]) -> None:
+    """UPDATE "user" SET last_seen = ... FROM (VALUES ...) for many users in one statement per batch.
+
+    Never moves last_seen backwards (another worker may have written a later value).
+    """
+    rows = list(seen.items())
+    for start in range(0, len(rows), FLUSH_BATCH_ROWS):
+        v = values(
+            column("id", Uuid), column("last_seen", DateTime(timezone=True)), name="v"
+        ).data(rows[start : start + FLUSH_BATCH_ROWS])
+        await db.execute(
+            update(User)
+            .where(User.id == v.c.id)
+            # Presence is not a profile change: keep updated_at as it is
+            .values(last_seen=func.greatest(User.last_seen, v.c.last_seen), updated_at=User.updated_at)
+        )
+    await db.commit()
+    # /me serves the cached user snapshot, which includes last_seen
+    for user_id in seen:
+        principal.invalidate_user(user_id)
+
+
+class PresenceRegistry:
+    def __init__(self, offline_grace_seconds: float, flush_interval_seconds: float) -> None:
+        self.offline_grace = offline_grace_seconds
+        self.flush_interval = flush_interval_seconds
+        self.flushes = 0
+        # user -> open connections on this worker, and the chats to announce their presence in
+        self._connections: dict[uuid.UUID, int] = {}
+        self._chats: dict[uuid.UUID, set[uuid.UUID]] = {}
+        self._online: set[uuid.UUID] = set()
+        self._going_offline: dict[uuid.UUID, asyncio.TimerHandle] = {}
+        # user -> latest activity not yet written to user.last_seen
+        self._dirty: dict[uuid.UUID, datetime] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._flusher = asyncio.create_task(self._run(), name="presence-flush")
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        for handle in self._going_offline.values():
+            handle.cancel()
+        self._going_offline.clear()
+        await self.flush()
+
+    def is_online(self, user_id: uuid.UUID) -> bool:
+        return user_id in self._online
+
+    async def connect(self, user_id: uuid.UUID, chat_ids: Iterable[uuid.UUID]) -> None:
+        self._connections[user_id] = self._connections.get(user_id, 0) + 1
+        self._chats.setdefault(user_id, set()).update(chat_ids)
+        self.touch(user_id)
+        pending = self._going_offline.pop(user_id, None)
+        if pending is not None:
+            # Reconnected within the grace period: peers never saw them leave
+            pending.cancel()
+        if user_id not in self._online:
+            self._online.add(user_id)
+            await self._announce(user_id, "online")
+
+    def touch(self, user_id: uuid.UUID) -> None:
+        self._dirty[user_id] = datetime.now(timezone.utc)
+
+    def disconnect(self, user_id: uuid.UUID) -> None:
+        remaining = self._connections.get(user_id, 0) - 1
+        self.touch(user_id)
+        if remaining > 0:
+            self._connections[user_id] = remaining
+            return
+        self._connections.pop(user_id, None)
+        loop = asyncio.get_running_loop()
+        self._going_offline[user_id] = loop.call_later(self.offline_grace, self._expire, user_id)
+
+    def _expire(self, user_id: uuid.UUID) -> None:
+        self._going_offline.pop(user_id, None)
+        if user_id in self._connections:
+            return
+        self._online.discard(user_id)
+        task = asyncio.create_task(self._announce(user_id, "offline"))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _announce(self, user_id: uuid.UUID, status: str) -> None:
+        chat_ids = self._chats.get(user_id, set()) if status == "online" else self._chats.pop(user_id, set())
+        last_seen = self._dirty.get(user_id) or datetime.now(timezone.utc)
+        frame = frames.event(
+            {"type": "presence", "user_id": user_id, "status": status, "last_seen": last_seen}
+        )
+        # One frame per peer socket however many chats they share, none to the user's own sockets;
+        # only the latest state matters to a slow client
+        await manager.broadcast_to_chats(chat_ids, frame, exclude_user=user_id, coalesce_key=("presence", user_id))
+
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+        seen, self._dirty = self._dirty, {}
+        try:
+            async with AsyncSessionLocal() as db:
+                await write_last_seen(db, seen)
+            self.flushes += 1
+        except Exception:
+            logger.warning("Failed to write last_seen for %d users; retrying next flush", len(seen), exc_info=True)
+            for user_id, at in seen.items():
+                if user_id not in self._dirty:
+                    self._dirty[user_id] = at
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "online_users": len(self._online),
+            "pending_last_seen": len(self._dirty),
+            "flushes": self.flushes,
+        }
+
+
+_settings = get_settings()
+presence = PresenceRegistry(
+    offline_grace_seconds=_settings.PRESENCE_OFFLINE_GRACE_SECONDS,
+    flush_interval_seconds=_settings.PRESENCE_FLUSH_INTERVAL_SECONDS,
+)
@@ -0,0 +1,44 @@
+"""Ephemeral `typing` events: never stored, rate-limited per (user, chat).
+
+A client may send `typing` on every keystroke. The first one in an interval is broadcast; the
+rest are dropped until `interval_ms` has passed, so a chat receives at most one typing frame per
+user per interval however fast clients send. Each broadcast carries `expires_in_ms`, after which
+clients hide the indicator unless a newer one arrives; there is no "stopped typing" event.
+"""
+import uuid
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.realtime.manager import manager
+
+
+class TypingIndicators:
+    def __init__(self, interval_ms: float, expires_ms: int, max_tracked: int = 100_000) -> None:
+        self.expires_ms = expires_ms
+        self.sent = 0
+        self.suppressed = 0
+        # (chat_id, user_id) -> True while the last broadcast for that pair is younger than the interval
+        self._recent: TTLCache[tuple[uuid.UUID, uuid.UUID], bool] = TTLCache(max_tracked, interval_ms / 1000)
+
+    async def typing(self, chat_id: uuid.UUID, user_id: uuid.UUID) -> None:
+        key = (chat_id, user_id)
+        if self._recent.get(key):
+            self.suppressed += 1
+            return
+        self._recent.set(key, True)
+        self.sent += 1
+        await manager.broadcast(
+            chat_id,
+            {"type": "typing", "chat_id": chat_id, "user_id": user_id, "expires_in_ms": self.expires_ms},
+            coalesce_key=("typing", chat_id, user_id),
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {"sent": self.sent, "suppressed": self.suppressed}
+
+
+_settings = get_settings()
+typing_indicators = TypingIndicators(
+    interval_ms=_settings.TYPING_INTERVAL_MS,
+    expires_ms=_settings.TYPING_EXPIRES_MS,
+)
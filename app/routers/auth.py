@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import create_access_token, get_password_hash, verify_password
+from app.core.security import create_access_token, hash_password, verify_and_update_password
 from app.db.session import get_db
 from app.deps import get_current_user
 from app.models.user import User
@@ -28,7 +28,7 @@ router = APIRouter(prefix="", tags=["Auth"])
 async def register(payload: UserCreate, db: AsyncSession = Depends(get_db)) -> UserPublic:
     # Check uniqueness
     existing = await db.execute(
-        select(User).where(or_(User.email == payload.email, User.username == payload.username))
+        select(User.id).where(or_(User.email == payload.email, User.username == payload.username)).limit(1)
     )
     if existing.scalar_one_or_none():
         raise HTTPException(status_code=400, detail="Email or username already in use")
@@ -36,7 +36,7 @@ async def register(payload: UserCreate, db: AsyncSession = Depends(get_db)) -> U
     user = User(
         email=payload.email,
         username=payload.username,
-        password_hash=get_password_hash(payload.password),
+        password_hash=await hash_password(payload.password),
         first_name=payload.first_name,
         last_name=payload.last_name,
         avatar=payload.avatar,
@@ -62,8 +62,15 @@ async def login(payload: LoginRequest, db: AsyncSession = Depends(get_db)) -> To
         select(User).where(or_(User.email == payload.username_or_email, User.username == payload.username_or_email))
     )
     user = q.scalar_one_or_none()
-    if not user or not verify_password(payload.password, user.password_hash):
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    valid, new_hash = await verify_and_update_password(payload.password, user.password_hash)
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # Work factor changed since this hash was made: upgrade it transparently
+        user.password_hash = new_hash
+        await db.commit()
 
     token = create_access_token(subject=str(user.id))
     return Token(access_token=token)
@@ -86,8 +93,14 @@ async def login_token(
         select(User).where(or_(User.email == form_data.username, User.username == form_data.username))
     )
     user = q.scalar_one_or_none()
-    if not user or not verify_password(form_data.password, user.password_hash):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    valid, new_hash = await verify_and_update_password(form_data.password, user.password_hash)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
 
     token = create_access_token(subject=str(user.id))
     return Token(access_token=token)
@@ -1,25 +1,118 @@
+import html
 import uuid
-from typing import Annotated, Dict, List
+from typing import Annotated, Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import and_, desc, func, or_, select
+from sqlalchemy import desc, func, literal, literal_column, select, true, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import load_only
 
 from app.core.config import PaginationParams
+from app.db.counting import TotalMode, count_rows
 from app.db.session import get_db
-from app.deps import get_current_user
+from app.deps import get_current_user, get_read_db
 from app.models.chat import Chat, ChatUser
-from app.models.message import Message, MessageSeen
+from app.models.message import SEARCH_CONFIG, Message
 from app.models.user import User
 from app.schemas.chat import ChatDetail, ChatPreview, ChatWithMessagesPage, ChatCreate
-from app.schemas.common import Page
-from app.schemas.message import LastMessagePreview, MessageCreate, MessageOut
+from app.schemas.common import CursorPage, Page
+from app.schemas.message import LastMessagePreview, MessageCreate, MessageOut, MessageSearchHit
 from app.schemas.user import UserPublic
+from app.services import membership
+from app.services.messages import create_message
+from app.services.receipts import receipts_for
+from app.utils.cursor import decode_cursor, encode_cursor
 
 
 router = APIRouter(prefix="/chats", tags=["Chats"])
 
+# Columns needed to render UserPublic / display names; skips password_hash and timestamps
+_USER_PUBLIC_COLUMNS = load_only(
+    User.id, User.email, User.username, User.first_name, User.last_name, User.avatar, User.last_seen
+)
+
+
+# ts_headline returns the raw message text, so it marks hits with private-use characters (removed
+# from the text beforehand); the snippet is HTML-escaped and only then are those turned into <mark>.
+_MARK_START, _MARK_STOP = "\ue000", "\ue001"
+_HEADLINE_OPTIONS = (
+    f'StartSel="{_MARK_START}", StopSel="{_MARK_STOP}", '
+    "MaxWords=20, MinWords=8, MaxFragments=2, FragmentDelimiter= … "
+)
+
+
+def _render_snippet(headline: str) -> str:
+    return html.escape(headline).replace(_MARK_START, "<mark>").replace(_MARK_STOP, "</mark>")
+
+
+async def _search_messages(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    q: str,
+    limit: int,
+    before: Optional[str],
+    chat_id: Optional[uuid.UUID] = None,
+) -> CursorPage[MessageSearchHit]:
+    try:
+        cursor = decode_cursor(before) if before else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    config = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+    tsquery = func.websearch_to_tsquery(config, q)
+
+    # Matching ids only, found chat by chat: for each of the caller's chats, the (chat_id, search_vector)
+    # GIN index (or a newest-first walk of the chat's history) yields that chat's newest limit + 1 hits,
+    # so messages in other chats are never read and common terms stay bounded. Newest first, keyset
+    # over (created_at, id), one extra row.
+    my_chats = select(ChatUser.chat_id).where(ChatUser.user_id == user_id)
+    if chat_id is not None:
+        my_chats = my_chats.where(ChatUser.chat_id == chat_id)
+    my_chats = my_chats.subquery("my_chats")
+    chat_hits_q = (
+        select(Message.id, Message.created_at)
+        .where(Message.chat_id == my_chats.c.chat_id, Message.search_vector.bool_op("@@")(tsquery))
+        .order_by(desc(Message.created_at), desc(Message.id))
+        .limit(limit + 1)
+    )
+    if cursor:
+        chat_hits_q = chat_hits_q.where(
+            tuple_(Message.created_at, Message.id) < tuple_(literal(cursor[0]), literal(cursor[1]))
+        )
+    chat_hits = chat_hits_q.lateral("chat_hits")
+    hits_q = (
+        select(chat_hits.c.id, chat_hits.c.created_at)
+        .select_from(my_chats)
+        .join(chat_hits, true())
+        .order_by(desc(chat_hits.c.created_at), desc(chat_hits.c.id))
+        .limit(limit + 1)
+    )
+    hits = hits_q.subquery()
+
+    # ts_headline re-parses the document, so it only runs for the page being returned
+    page_q = (
+        select(
+            Message,
+            func.ts_headline(
+                config,
+                func.translate(func.coalesce(Message.text_content, ""), _MARK_START + _MARK_STOP, ""),
+                tsquery,
+                _HEADLINE_OPTIONS,
+            ),
+        )
+        .join(hits, hits.c.id == Message.id)
+        .order_by(desc(hits.c.created_at), desc(hits.c.id))
+    )
+    rows = (await db.execute(page_q)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [
+        MessageSearchHit(message=MessageOut.model_validate(m), snippet=_render_snippet(headline)) for m, headline in rows
+    ]
+    next_cursor = encode_cursor(rows[-1][0].created_at, rows[-1][0].id) if has_more else None
+    return CursorPage[MessageSearchHit](items=items, limit=limit, next_cursor=next_cursor)
+
 
 def _other_user_name(users: List[User], me_id: uuid.UUID) -> tuple[str, str | None]:
     others = [u for u in users if u.id != me_id]
@@ -35,62 +128,57 @@ def _other_user_name(users: List[User], me_id: uuid.UUID) -> tuple[str, str | No
     "",
     response_model=Page[ChatPreview],
     summary="List chats for current user",
-    description="Returns chat previews with last message. Supports pagination.",
+    description=(
+        "Returns chat previews with last message. Supports pagination; `total` is only included "
+        "with `with_total=exact|estimate`, `has_more` is always set."
+    ),
 )
 async def list_chats(
     pagination: Annotated[PaginationParams, Depends()],
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> Page[ChatPreview]:
-    # Chats where current user is a member
-    member_chats_sub = (
-        select(Chat.id)
+    # Chats where current user is a member, most recently active first (chats without messages last).
+    # Ordering uses the denormalized Chat.last_activity_at, so cost does not depend on message volume.
+    # One extra row tells whether another page exists without counting
+    chats_q = (
+        select(Chat, ChatUser.last_read_seq)
         .join(ChatUser, ChatUser.chat_id == Chat.id)
         .where(ChatUser.user_id == current_user.id)
-        .subquery()
-    )
-
-    # Latest message per chat (created_at)
-    latest_per_chat = (
-        select(Message.chat_id, func.max(Message.created_at).label("max_created"))
-        .where(Message.chat_id.in_(select(member_chats_sub.c.id)))
-        .group_by(Message.chat_id)
-        .subquery()
-    )
-
-    # Order chats by latest message desc (nulls last)
-    chats_q = (
-        select(Chat)
-        .where(Chat.id.in_(select(member_chats_sub.c.id)))
-        .join(latest_per_chat, Chat.id == latest_per_chat.c.chat_id, isouter=True)
-        .order_by(latest_per_chat.c.max_created.desc().nullslast())
+        .order_by(Chat.last_activity_at.desc().nullslast(), Chat.id.desc())
         .offset(pagination.offset)
-        .limit(pagination.limit)
+        .limit(pagination.limit + 1)
     )
 
-    total_q = select(func.count()).select_from(member_chats_sub)
-
-    total_res, chats_res = await db.execute(total_q), await db.execute(chats_q)
-    total = int(total_res.scalar() or 0)
-    chats = chats_res.scalars().all()
-
-    # Fetch users per chat (for computing names/avatars)
-    users_res = await db.execute(
-        select(ChatUser.chat_id, User)
-        .join(User, User.id == ChatUser.user_id)
-        .where(ChatUser.chat_id.in_([c.id for c in chats]))
+    total = await count_rows(
+        db, select(ChatUser.chat_id).where(ChatUser.user_id == current_user.id), pagination.with_total
     )
+    rows = (await db.execute(chats_q)).all()
+    has_more = len(rows) > pagination.limit
+    rows = rows[: pagination.limit]
+    chats = [c for c, _ in rows]
+    read_seq_by_chat = {c.id: read_seq for c, read_seq in rows}
+
+    # Fetch users of direct chats, which are named after the other member; groups have their own
+    # name and avatar, so their (possibly large) member lists are never loaded here
+    direct_ids = [c.id for c in chats if not c.is_group]
     users_by_chat: Dict[uuid.UUID, List[User]] = {}
-    for chat_id, user in users_res.all():
-        users_by_chat.setdefault(chat_id, []).append(user)
-
-    # Fetch latest message entities
-    latest_res = await db.execute(
-        select(Message)
-        .join(latest_per_chat, and_(Message.chat_id == latest_per_chat.c.chat_id, Message.created_at == latest_per_chat.c.max_created), isouter=True)
-        .where(Message.chat_id.in_([c.id for c in chats]))
-    )
-    latest_by_chat: Dict[uuid.UUID, Message] = {m.chat_id: m for m in latest_res.scalars().all()}
+    if direct_ids:
+        users_res = await db.execute(
+            select(ChatUser.chat_id, User)
+            .join(User, User.id == ChatUser.user_id)
+            .where(ChatUser.chat_id.in_(direct_ids))
+            .options(_USER_PUBLIC_COLUMNS)
+        )
+        for chat_id, user in users_res.all():
+            users_by_chat.setdefault(chat_id, []).append(user)
+
+    # Fetch latest message entities by primary key
+    last_ids = [c.last_message_id for c in chats if c.last_message_id]
+    latest_by_chat: Dict[uuid.UUID, Message] = {}
+    if last_ids:
+        latest_res = await db.execute(select(Message).where(Message.id.in_(last_ids)))
+        latest_by_chat = {m.chat_id: m for m in latest_res.scalars().all()}
 
     items: List[ChatPreview] = []
     for c in chats:
@@ -110,10 +198,13 @@ async def list_chats(
                 name=display_name,
                 avatar=display_avatar,
                 last_message=last_message,
+                unread_count=max(c.message_count - read_seq_by_chat[c.id], 0),
             )
         )
 
-    return Page[ChatPreview](items=items, total=total, limit=pagination.limit, offset=pagination.offset)
+    return Page[ChatPreview](
+        items=items, total=total, limit=pagination.limit, offset=pagination.offset, has_more=has_more
+    )
 
 
 @router.post(
@@ -136,7 +227,9 @@ async def create_chat(
         raise HTTPException(status_code=400, detail="At least 1 other user is required")
 
     # Verify users exist
-    users_res = await db.execute(select(User).where(User.id.in_(list(participant_ids))))
+    users_res = await db.execute(
+        select(User).where(User.id.in_(list(participant_ids))).options(_USER_PUBLIC_COLUMNS)
+    )
     users_map = {u.id: u for u in users_res.scalars().all()}
     missing = participant_ids - set(users_map.keys())
     if missing:
@@ -170,29 +263,85 @@ async def create_chat(
         db.add(ChatUser(chat_id=chat.id, user_id=uid))
 
     await db.commit()
+    for uid in participant_ids:
+        membership.invalidate(uid, chat.id)
 
     members = [UserPublic.model_validate(users_map[pid]) for pid in participant_ids]
     return ChatDetail(id=chat.id, is_group=is_group, name=chat.name, avatar=chat.avatar, users=members)
 
 
+@router.get(
+    "/search",
+    response_model=CursorPage[MessageSearchHit],
+    summary="Search messages in my chats",
+    description=(
+        "Full-text search over message text in every chat the current user belongs to. "
+        'Accepts web-search syntax (`"exact phrase"`, `or`, `-word`). Newest first; '
+        "pass `next_cursor` as `before` to continue."
+    ),
+)
+async def search_messages(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+    q: Annotated[str, Query(min_length=1, max_length=200, description="Search query")],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    before: Annotated[Optional[str], Query(description="Cursor: return hits older than this one")] = None,
+) -> CursorPage[MessageSearchHit]:
+    return await _search_messages(db, current_user.id, q, limit, before)
+
+
+@router.get(
+    "/{chat_id}/search",
+    response_model=CursorPage[MessageSearchHit],
+    summary="Search messages in a chat",
+    description="Full-text search over message text within one chat. Same syntax and paging as `/chats/search`.",
+)
+async def search_chat_messages(
+    chat_id: uuid.UUID,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+    q: Annotated[str, Query(min_length=1, max_length=200, description="Search query")],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    before: Annotated[Optional[str], Query(description="Cursor: return hits older than this one")] = None,
+) -> CursorPage[MessageSearchHit]:
+    if not await membership.is_member(db, chat_id, current_user.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
+    return await _search_messages(db, current_user.id, q, limit, before, chat_id=chat_id)
+
+
 @router.get(
     "/{chat_id}",
     response_model=ChatWithMessagesPage,
     summary="Get chat details and messages",
-    description="Returns chat details and paginated messages (newest first).",
+    description=(
+        "Returns chat details and paginated messages (newest first). Page through history with the "
+        "opaque `before` (older) / `after` (newer) cursors returned as `next_cursor` / `prev_cursor`; "
+        "`offset` is kept for backwards compatibility. `total` is only computed with `with_total=exact|estimate`."
+    ),
 )
 async def get_chat(
     chat_id: uuid.UUID,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: Annotated[User, Depends(get_current_user)],
     limit: Annotated[int, Query(ge=1, le=100)] = 20,
     offset: Annotated[int, Query(ge=0)] = 0,
+    before: Annotated[Optional[str], Query(description="Cursor: return messages older than this one")] = None,
+    after: Annotated[Optional[str], Query(description="Cursor: return messages newer than this one")] = None,
+    with_total: Annotated[
+        Optional[TotalMode], Query(description="Also return `total`: an exact count, or a cheap planner estimate")
+    ] = None,
 ) -> ChatWithMessagesPage:
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    if (before or after) and offset:
+        raise HTTPException(status_code=400, detail="offset cannot be combined with a cursor")
+    try:
+        cursor = decode_cursor(before or after) if (before or after) else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
     # Ensure membership
-    member = await db.execute(
-        select(ChatUser).where(ChatUser.chat_id == chat_id, ChatUser.user_id == current_user.id)
-    )
-    if not member.scalar_one_or_none():
+    if not await membership.is_member(db, chat_id, current_user.id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
 
     chat_res = await db.execute(select(Chat).where(Chat.id == chat_id))
@@ -200,29 +349,53 @@ async def get_chat(
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    # Users in chat
+    # Users in chat, with their read watermarks
     users_res = await db.execute(
-        select(User).join(ChatUser, ChatUser.user_id == User.id).where(ChatUser.chat_id == chat_id)
+        select(User, ChatUser.last_read_seq, ChatUser.last_read_at)
+        .join(ChatUser, ChatUser.user_id == User.id)
+        .where(ChatUser.chat_id == chat_id)
+        .options(_USER_PUBLIC_COLUMNS)
     )
-    users = [UserPublic.model_validate(u) for u in users_res.scalars().all()]
-
-    # Messages (newest first)
-    total_res = await db.execute(select(func.count()).select_from(Message).where(Message.chat_id == chat_id))
-    total = int(total_res.scalar() or 0)
-
-    msgs_res = await db.execute(
-        select(Message).where(Message.chat_id == chat_id).order_by(desc(Message.created_at)).offset(offset).limit(limit)
-    )
-    messages = [MessageOut.model_validate(m) for m in msgs_res.scalars().all()]
+    member_rows = users_res.all()
+    members = [u for u, _, _ in member_rows]
+    users = [UserPublic.model_validate(u) for u in members]
+    watermarks = [(u.id, read_seq, read_at) for u, read_seq, read_at in member_rows]
+
+    total = await count_rows(db, select(Message.id).where(Message.chat_id == chat_id), with_total)
+
+    # Messages (newest first), keyset over (created_at, id) backed by ix_message_chat_id_created_at_id.
+    # One extra row is fetched to know whether the page continues.
+    key = tuple_(Message.created_at, Message.id)
+    msgs_q = select(Message).where(Message.chat_id == chat_id)
+    if after:
+        msgs_q = msgs_q.where(key > tuple_(literal(cursor[0]), literal(cursor[1]))).order_by(
+            Message.created_at, Message.id
+        )
+    else:
+        if before:
+            msgs_q = msgs_q.where(key < tuple_(literal(cursor[0]), literal(cursor[1])))
+        msgs_q = msgs_q.order_by(desc(Message.created_at), desc(Message.id)).offset(offset)
+    msgs_res = await db.execute(msgs_q.limit(limit + 1))
+    rows = list(msgs_res.scalars().all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after:
+        rows.reverse()
+    messages = []
+    for m in rows:
+        out = MessageOut.model_validate(m)
+        out.seen_by = receipts_for(m, watermarks)
+        messages.append(out)
+
+    # next_cursor: older messages exist (always true when paging forward from a cursor).
+    # prev_cursor: newest message on the page, or the incoming cursor when nothing newer arrived yet.
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if rows and (has_more or after) else None
+    prev_cursor = encode_cursor(rows[0].created_at, rows[0].id) if rows else after
 
     # Compute display name/avatar for direct chats
     name = chat.name
     avatar = chat.avatar
     if not chat.is_group:
-        members_res = await db.execute(
-            select(User).join(ChatUser, ChatUser.user_id == User.id).where(ChatUser.chat_id == chat_id)
-        )
-        members = members_res.scalars().all()
         name, avatar = _other_user_name(members, current_user.id)
 
     return ChatWithMessagesPage(
@@ -231,6 +404,9 @@ async def get_chat(
         total=total,
         limit=limit,
         offset=offset,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        has_more=has_more,
     )
 
 
@@ -247,19 +423,13 @@ async def send_message_rest(
     db: Annotated[AsyncSession, Depends(get_db)],
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> MessageOut:
-    is_member = await db.execute(
-        select(ChatUser).where(ChatUser.chat_id == chat_id, ChatUser.user_id == current_user.id)
-    )
-    if not is_member.scalar_one_or_none():
+    if not await membership.is_member(db, chat_id, current_user.id):
         raise HTTPException(status_code=404, detail="Chat not found")
 
     if not payload.text_content and not payload.image_content:
         raise HTTPException(status_code=400, detail="text_content or image_content is required")
 
-    msg = Message(chat_id=chat_id, from_user_id=current_user.id, text_content=payload.text_content, image_content=payload.image_content)
-    db.add(msg)
-    await db.commit()
-    await db.refresh(msg)
+    msg = await create_message(db, chat_id, current_user.id, payload.text_content, payload.image_content)
     return MessageOut.model_validate(msg)
 
 
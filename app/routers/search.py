@@ -1,63 +1,83 @@
-from typing import Annotated
+from typing import Annotated, Literal
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy import func, or_, select, case
+from sqlalchemy import func, literal, or_, select, case
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import PaginationParams
-from app.db.session import get_db
+from app.db.counting import count_rows
 from app.models.user import User
 from app.schemas.common import Page
 from app.schemas.user import UserSearchPublic
-from app.deps import get_current_user
+from app.deps import get_current_user, get_read_db
 
 
 router = APIRouter(prefix="", tags=["Search"])
 
 
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 @router.get(
     "/search",
     response_model=Page[UserSearchPublic],
     summary="Search users",
     description=(
         "Fast user search across username, first_name, and last_name. "
-        "Matches are case-insensitive and prioritize exact/prefix username matches."
+        "Matches are case-insensitive and prioritize exact/prefix username matches. "
+        "`mode=prefix` (default) matches prefixes of the username, first name, last name or 'first last'; "
+        "`mode=fuzzy` additionally tolerates typos using trigram similarity and ranks by relevance. "
+        "`total` is only included with `with_total`; use `has_more` to drive paging."
     ),
 )
 async def search_users(
-    q: Annotated[str, Query(min_length=1, max_length=100, description="Query string")],
+    # Whitespace-only would become LIKE '%' and match everyone
+    q: Annotated[str, Query(min_length=1, max_length=100, pattern=r"\S", description="Query string")],
     pagination: Annotated[PaginationParams, Depends()],
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: Annotated[User, Depends(get_current_user)],
+    mode: Annotated[Literal["prefix", "fuzzy"], Query(description="Matching mode")] = "prefix",
 ) -> Page[UserSearchPublic]:
-    query = q.strip()
-    like = f"{query}%"
+    query = q.strip().lower()
+    like = f"{_escape_like(query)}%"
+    word_like = f"% {_escape_like(query)}%"
 
-    where_clause = or_(
-        func.lower(User.username).like(func.lower(like)),
-        func.lower(User.first_name).like(func.lower(like)),
-        func.lower(User.last_name).like(func.lower(like)),
-    )
+    # All predicates are served by the pg_trgm GIN indexes on lower(username) and search_name
+    username = func.lower(User.username)
+    predicates = [
+        username.like(like, escape="\\"),
+        User.search_name.like(like, escape="\\"),  # first name, or "first last"
+        User.search_name.like(word_like, escape="\\"),  # last name
+    ]
+    if mode == "fuzzy":
+        predicates += [
+            username.op("%")(query),  # similarity above pg_trgm.similarity_threshold
+            literal(query).op("<%")(User.search_name),  # close to a word of the full name
+        ]
 
     # Exclude self
-    base = select(User).where(where_clause, User.id != current_user.id)
-
-    # Prioritize: exact username match > prefix username match > others
-    ordering = (
-        case((func.lower(User.username) == func.lower(query), 0), else_=1),
-        case((func.lower(User.username).like(func.lower(like)), 0), else_=1),
-        func.lower(User.username),
-        func.lower(User.first_name),
-        func.lower(User.last_name),
-    )
+    base = select(User).where(or_(*predicates), User.id != current_user.id)
 
-    total_res = await db.execute(select(func.count()).select_from(base.subquery()))
-    total = int(total_res.scalar() or 0)
+    # Prioritize: exact username match > prefix username match > relevance (fuzzy) > alphabetical
+    ordering = [
+        case((username == query, 0), else_=1),
+        case((username.like(like, escape="\\"), 0), else_=1),
+    ]
+    if mode == "fuzzy":
+        relevance = func.greatest(func.similarity(username, query), func.word_similarity(query, User.search_name))
+        ordering.append(relevance.desc())
+    ordering += [username, User.search_name]
 
+    total = await count_rows(db, base, pagination.with_total)
+
+    # One extra row tells whether another page exists without counting the whole match set
     res = await db.execute(
-        base.order_by(*ordering).offset(pagination.offset).limit(pagination.limit)
+        base.order_by(*ordering).offset(pagination.offset).limit(pagination.limit + 1)
+    )
+    users = list(res.scalars().all())
+    has_more = len(users) > pagination.limit
+    items = [UserSearchPublic.model_validate(u) for u in users[: pagination.limit]]
+    return Page[UserSearchPublic](
+        items=items, total=total, limit=pagination.limit, offset=pagination.offset, has_more=has_more
     )
-    items = [UserSearchPublic.model_validate(u) for u in res.scalars().all()]
-    return Page[UserSearchPublic](items=items, total=total, limit=pagination.limit, offset=pagination.offset)
-
-
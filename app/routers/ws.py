@@ -1,63 +1,30 @@
-import json
 import uuid
 from datetime import datetime, timezone
-from typing import Any, Dict, Set
+from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import metrics
+from app.core.config import get_settings
 from app.core.security import decode_token
-from app.db.session import get_db
+from app.db import replica
+from app.db.session import AsyncSessionLocal
 from app.models.chat import ChatUser
-from app.models.message import Message, MessageSeen
-from app.schemas.message import MessageCreate, MessageOut
+from app.realtime import frames
+from app.realtime.manager import manager
+from app.realtime.presence import presence
+from app.realtime.typing_indicators import typing_indicators
+from app.schemas.message import MessageCreate
+from app.services import membership
+from app.services.message_writer import message_writer
+from app.services.messages import NewMessage
+from app.services.receipts import SeenCoalescer
 
 
 router = APIRouter(prefix="/ws", tags=["WebSocket"])
 
 
-class ChatConnectionManager:
-    def __init__(self) -> None:
-        self.chat_connections: dict[uuid.UUID, set[WebSocket]] = {}
-
-    async def accept(self, websocket: WebSocket) -> None:
-        await websocket.accept()
-
-    async def connect(self, chat_id: uuid.UUID, websocket: WebSocket) -> None:
-        await self.accept(websocket)
-        self.subscribe(chat_id, websocket)
-
-    def subscribe(self, chat_id: uuid.UUID, websocket: WebSocket) -> None:
-        self.chat_connections.setdefault(chat_id, set()).add(websocket)
-
-    def disconnect(self, chat_id: uuid.UUID, websocket: WebSocket) -> None:
-        conns = self.chat_connections.get(chat_id)
-        if conns and websocket in conns:
-            conns.remove(websocket)
-            if not conns:
-                self.chat_connections.pop(chat_id, None)
-
-    def unsubscribe_all(self, websocket: WebSocket) -> None:
-        for chat_id, conns in list(self.chat_connections.items()):
-            if websocket in conns:
-                conns.remove(websocket)
-                if not conns:
-                    self.chat_connections.pop(chat_id, None)
-
-    async def broadcast(self, chat_id: uuid.UUID, message: dict[str, Any]) -> None:
-        data = json.dumps(message, default=str)
-        for ws in list(self.chat_connections.get(chat_id, set())):
-            try:
-                await ws.send_text(data)
-            except Exception:
-                # Drop broken connections silently
-                self.disconnect(chat_id, ws)
-
-
-manager = ChatConnectionManager()
-
-
 async def _authenticate_ws(websocket: WebSocket) -> dict[str, Any]:
     token = websocket.query_params.get("token")
     if not token:
@@ -75,11 +42,58 @@ async def _authenticate_ws(websocket: WebSocket) -> dict[str, Any]:
         raise
 
 
+async def _is_member(chat_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    # WebSocket handlers never hold a pooled connection while idle: each check or write
+    # checks out a session for just that event (none at all on a membership cache hit).
+    async with AsyncSessionLocal() as db:
+        return await membership.is_member(db, chat_id, user_id)
+
+
+async def _broadcast_seen(
+    chat_id: uuid.UUID, user_id: uuid.UUID, last_read_id: uuid.UUID, newly_seen: list[uuid.UUID]
+) -> None:
+    # Called once the read watermark is committed; it was written outside a request session
+    replica.pin(user_id)
+    await manager.broadcast(
+        chat_id,
+        {
+            "type": "seen",
+            "chat_id": str(chat_id),
+            "user_id": str(user_id),
+            "message_ids": [str(i) for i in newly_seen],
+            "last_read_message_id": str(last_read_id),
+        },
+        coalesce_key=("seen", chat_id, user_id),
+    )
+
+
+seen_coalescer = SeenCoalescer(get_settings().SEEN_COALESCE_WINDOW_MS, on_read=_broadcast_seen)
+
+
+async def _receive(websocket: WebSocket) -> str | bytes:
+    """Next inbound frame: text (JSON) or binary (MessagePack)."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", status.WS_1000_NORMAL_CLOSURE))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message["text"]
+
+
+def _parse_message_ids(raw: Any) -> list[uuid.UUID]:
+    ids: list[uuid.UUID] = []
+    for mid in raw if isinstance(raw, list) else []:
+        try:
+            ids.append(uuid.UUID(str(mid)))
+        except Exception:
+            continue
+    return ids
+
+
 @router.websocket("/chats/{chat_id}")
 async def ws_chat(
     websocket: WebSocket,
     chat_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
 ) -> None:
     payload = await _authenticate_ws(websocket)
     user_sub = payload.get("sub")
@@ -90,59 +104,55 @@ async def ws_chat(
         return
 
     # Ensure membership
-    member = await db.execute(select(ChatUser).where(ChatUser.chat_id == chat_id, ChatUser.user_id == user_id))
-    if not member.scalar_one_or_none():
+    if not await _is_member(chat_id, user_id):
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
-    await manager.connect(chat_id, websocket)
+    conn = await manager.connect(chat_id, websocket, user_id)
+    await presence.connect(user_id, [chat_id])
     try:
         while True:
-            text = await websocket.receive_text()
+            raw = await _receive(websocket)
             try:
-                data = json.loads(text)
+                data = frames.decode(raw)
             except Exception:
-                await websocket.send_text(json.dumps({"type": "error", "error": "Invalid JSON"}))
+                metrics.ws_event("invalid")
+                conn.send(frames.ERROR_INVALID_JSON)
                 continue
 
             event_type = data.get("type")
+            metrics.ws_event(event_type)
             if event_type == "message":
                 msg_in = MessageCreate(**{k: data.get(k) for k in ("text_content", "image_content")})
                 if not msg_in.text_content and not msg_in.image_content:
-                    await websocket.send_text(json.dumps({"type": "error", "error": "text_content or image_content required"}))
+                    conn.send(frames.ERROR_CONTENT_REQUIRED)
                     continue
-                msg = Message(chat_id=chat_id, from_user_id=user_id, text_content=msg_in.text_content, image_content=msg_in.image_content)
-                db.add(msg)
-                await db.commit()
-                await db.refresh(msg)
-                out = MessageOut.model_validate(msg)
-                await manager.broadcast(chat_id, {"type": "message", "message": out.model_dump(mode="json")})
-            elif event_type == "seen":
-                ids = data.get("message_ids") or []
-                for mid in ids:
-                    try:
-                        m_uuid = uuid.UUID(str(mid))
-                    except Exception:
-                        continue
-                    db.add(MessageSeen(message_id=m_uuid, user_id=user_id))
                 try:
-                    await db.commit()
+                    msg = await message_writer.submit(NewMessage(chat_id, user_id, msg_in.text_content, msg_in.image_content))
                 except Exception:
-                    # Unique constraint violations are okay (already seen)
-                    await db.rollback()
-                await manager.broadcast(chat_id, {"type": "seen", "chat_id": str(chat_id), "user_id": str(user_id), "message_ids": [str(i) for i in ids]})
+                    conn.send(frames.ERROR_NOT_STORED)
+                    continue
+                replica.pin(user_id)
+                await manager.broadcast(chat_id, frames.message_event(msg))
+            elif event_type == "seen":
+                seen_coalescer.submit(chat_id, user_id, _parse_message_ids(data.get("message_ids")))
+            elif event_type == "typing":
+                await typing_indicators.typing(chat_id, user_id)
             elif event_type == "ping":
-                await websocket.send_text(json.dumps({"type": "pong"}))
+                presence.touch(user_id)
+                conn.send(frames.PONG)
             else:
-                await websocket.send_text(json.dumps({"type": "error", "error": "Unknown event type"}))
+                conn.send(frames.ERROR_UNKNOWN_EVENT)
     except WebSocketDisconnect:
-        manager.disconnect(chat_id, websocket)
+        pass
+    finally:
+        presence.disconnect(user_id)
+        await manager.release(conn)
 
 
 @router.websocket("")
 async def ws_all(
     websocket: WebSocket,
-    db: AsyncSession = Depends(get_db),
 ) -> None:
     # Authenticate once
     payload = await _authenticate_ws(websocket)
@@ -153,94 +163,101 @@ async def ws_all(
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
-    # Accept connection
-    await manager.accept(websocket)
-
     # Subscribe to all current chats of the user
-    res = await db.execute(select(ChatUser.chat_id).where(ChatUser.user_id == user_id))
-    chat_ids = [row[0] for row in res.all()]
+    async with AsyncSessionLocal() as db:
+        res = await db.execute(select(ChatUser.chat_id).where(ChatUser.user_id == user_id))
+        chat_ids = [row[0] for row in res.all()]
+    membership.remember(user_id, chat_ids)
+
+    # Accept connection
+    conn = await manager.accept(websocket, user_id)
     for cid in chat_ids:
-        manager.subscribe(cid, websocket)
+        manager.subscribe(cid, conn)
+    await presence.connect(user_id, chat_ids)
 
     try:
         while True:
-            text = await websocket.receive_text()
+            raw = await _receive(websocket)
             try:
-                data = json.loads(text)
+                data = frames.decode(raw)
             except Exception:
-                await websocket.send_text(json.dumps({"type": "error", "error": "Invalid JSON"}))
+                metrics.ws_event("invalid")
+                conn.send(frames.ERROR_INVALID_JSON)
                 continue
 
             event_type = data.get("type")
+            metrics.ws_event(event_type)
             if event_type == "message":
                 # Require chat_id
                 try:
                     chat_id = uuid.UUID(str(data.get("chat_id")))
                 except Exception:
-                    await websocket.send_text(json.dumps({"type": "error", "error": "chat_id is required"}))
+                    conn.send(frames.ERROR_CHAT_ID_REQUIRED)
                     continue
                 # Ensure membership
-                member = await db.execute(select(ChatUser).where(ChatUser.chat_id == chat_id, ChatUser.user_id == user_id))
-                if not member.scalar_one_or_none():
-                    await websocket.send_text(json.dumps({"type": "error", "error": "Not a member of chat"}))
+                if not await _is_member(chat_id, user_id):
+                    conn.send(frames.ERROR_NOT_MEMBER)
                     continue
                 msg_in = MessageCreate(**{k: data.get(k) for k in ("text_content", "image_content")})
                 if not msg_in.text_content and not msg_in.image_content:
-                    await websocket.send_text(json.dumps({"type": "error", "error": "text_content or image_content required"}))
+                    conn.send(frames.ERROR_CONTENT_REQUIRED)
                     continue
-                msg = Message(chat_id=chat_id, from_user_id=user_id, text_content=msg_in.text_content, image_content=msg_in.image_content)
-                db.add(msg)
-                await db.commit()
-                await db.refresh(msg)
-                out = MessageOut.model_validate(msg)
-                await manager.broadcast(chat_id, {"type": "message", "chat_id": str(chat_id), "message": out.model_dump(mode="json")})
+                try:
+                    msg = await message_writer.submit(NewMessage(chat_id, user_id, msg_in.text_content, msg_in.image_content))
+                except Exception:
+                    conn.send(frames.ERROR_NOT_STORED)
+                    continue
+                replica.pin(user_id)
+                await manager.broadcast(chat_id, frames.message_event(msg, chat_id))
             elif event_type == "seen":
                 try:
                     chat_id = uuid.UUID(str(data.get("chat_id")))
                 except Exception:
-                    await websocket.send_text(json.dumps({"type": "error", "error": "chat_id is required"}))
+                    conn.send(frames.ERROR_CHAT_ID_REQUIRED)
                     continue
-                member = await db.execute(select(ChatUser).where(ChatUser.chat_id == chat_id, ChatUser.user_id == user_id))
-                if not member.scalar_one_or_none():
-                    await websocket.send_text(json.dumps({"type": "error", "error": "Not a member of chat"}))
+                if not await _is_member(chat_id, user_id):
+                    conn.send(frames.ERROR_NOT_MEMBER)
                     continue
-                ids = data.get("message_ids") or []
-                for mid in ids:
-                    try:
-                        m_uuid = uuid.UUID(str(mid))
-                    except Exception:
-                        continue
-                    db.add(MessageSeen(message_id=m_uuid, user_id=user_id))
+                seen_coalescer.submit(chat_id, user_id, _parse_message_ids(data.get("message_ids")))
+            elif event_type == "typing":
                 try:
-                    await db.commit()
+                    chat_id = uuid.UUID(str(data.get("chat_id")))
                 except Exception:
-                    await db.rollback()
-                await manager.broadcast(chat_id, {"type": "seen", "chat_id": str(chat_id), "user_id": str(user_id), "message_ids": [str(i) for i in ids]})
+                    conn.send(frames.ERROR_CHAT_ID_REQUIRED)
+                    continue
+                # Subscribed implies a checked membership; no DB lookup for an ephemeral event
+                if not manager.is_subscribed(chat_id, conn):
+                    conn.send(frames.ERROR_NOT_SUBSCRIBED)
+                    continue
+                await typing_indicators.typing(chat_id, user_id)
             elif event_type == "subscribe":
                 try:
                     chat_id = uuid.UUID(str(data.get("chat_id")))
                 except Exception:
-                    await websocket.send_text(json.dumps({"type": "error", "error": "chat_id is required"}))
+                    conn.send(frames.ERROR_CHAT_ID_REQUIRED)
                     continue
-                member = await db.execute(select(ChatUser).where(ChatUser.chat_id == chat_id, ChatUser.user_id == user_id))
-                if not member.scalar_one_or_none():
-                    await websocket.send_text(json.dumps({"type": "error", "error": "Not a member of chat"}))
+                if not await _is_member(chat_id, user_id):
+                    conn.send(frames.ERROR_NOT_MEMBER)
                     continue
-                manager.subscribe(chat_id, websocket)
-                await websocket.send_text(json.dumps({"type": "subscribed", "chat_id": str(chat_id)}))
+                manager.subscribe(chat_id, conn)
+                conn.send(frames.event({"type": "subscribed", "chat_id": chat_id}))
             elif event_type == "unsubscribe":
                 try:
                     chat_id = uuid.UUID(str(data.get("chat_id")))
                 except Exception:
-                    await websocket.send_text(json.dumps({"type": "error", "error": "chat_id is required"}))
+                    conn.send(frames.ERROR_CHAT_ID_REQUIRED)
                     continue
-                manager.disconnect(chat_id, websocket)
-                await websocket.send_text(json.dumps({"type": "unsubscribed", "chat_id": str(chat_id)}))
+                manager.disconnect(chat_id, conn)
+                conn.send(frames.event({"type": "unsubscribed", "chat_id": chat_id}))
             elif event_type == "ping":
-                await websocket.send_text(json.dumps({"type": "pong"}))
+                presence.touch(user_id)
+                conn.send(frames.PONG)
             else:
-                await websocket.send_text(json.dumps({"type": "error", "error": "Unknown event type"}))
+                conn.send(frames.ERROR_UNKNOWN_EVENT)
     except WebSocketDisconnect:
-        manager.unsubscribe_all(websocket)
+        pass
+    finally:
+        presence.disconnect(user_id)
+        await manager.release(conn)
 
 
@@ -1,7 +1,7 @@
 import uuid
 from typing import List, Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 from app.schemas.message import LastMessagePreview, MessageOut
 from app.schemas.user import UserPublic
@@ -15,6 +15,7 @@ class ChatPreview(BaseModel):
     avatar: Optional[str] = None
     is_group: bool
     last_message: Optional[LastMessagePreview] = None
+    unread_count: int = Field(default=0, ge=0, description="Messages after the caller's read watermark")
 
 
 class ChatDetail(BaseModel):
@@ -30,9 +31,12 @@ class ChatDetail(BaseModel):
 class ChatWithMessagesPage(BaseModel):
     chat: ChatDetail
     messages: list[MessageOut]
-    total: int
+    total: Optional[int] = Field(default=None, description="Message count; only set when requested with with_total")
     limit: int
     offset: int
+    next_cursor: Optional[str] = Field(default=None, description="Pass as `before` to load older messages")
+    prev_cursor: Optional[str] = Field(default=None, description="Pass as `after` to load newer messages")
+    has_more: bool = Field(default=False, description="More messages exist beyond this page in the paging direction")
 
 
 class ChatCreate(BaseModel):
@@ -1,4 +1,4 @@
-from typing import Generic, List, TypeVar
+from typing import Generic, List, Optional, TypeVar
 from pydantic import BaseModel, ConfigDict, Field
 
 T = TypeVar("T")
@@ -8,8 +8,13 @@ class Page(BaseModel, Generic[T]):
     model_config = ConfigDict(from_attributes=True)
 
     items: List[T]
-    total: int = Field(..., ge=0)
+    total: Optional[int] = Field(default=None, ge=0, description="Only set when requested with with_total")
     limit: int = Field(..., ge=1)
     offset: int = Field(..., ge=0)
+    has_more: bool = Field(default=False, description="More items exist after this page")
 
 
+class CursorPage(BaseModel, Generic[T]):
+    items: List[T]
+    limit: int = Field(..., ge=1)
+    next_cursor: Optional[str] = Field(default=None, description="Pass as `before` to load the next page")
@@ -26,7 +26,9 @@ class MessageOut(BaseModel):
     text_content: Optional[str] = None
     image_content: Optional[str] = None
     created_at: datetime
-    seen_by: List[MessageSeenOut] = Field(default_factory=list)
+    seen_by: List[MessageSeenOut] = Field(
+        default_factory=list, description="Members whose read watermark is at or past this message"
+    )
 
 
 class LastMessagePreview(BaseModel):
@@ -39,3 +41,8 @@ class LastMessagePreview(BaseModel):
     created_at: datetime
 
 
+class MessageSearchHit(BaseModel):
+    message: MessageOut
+    snippet: str = Field(
+        description="Matching fragment as HTML: message text escaped, hits wrapped in <mark></mark>"
+    )
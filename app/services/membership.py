@@ -0,0 +1,48 @@
+import uuid
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.models.chat import ChatUser
+
+
+settings = get_settings()
+
+# (user_id, chat_id) -> True. Only confirmed memberships are cached, so a membership created
+# on another worker is never hidden; the TTL bounds how long a removal can go unnoticed there.
+membership_cache: TTLCache[tuple[uuid.UUID, uuid.UUID], bool] = TTLCache(
+    maxsize=settings.MEMBERSHIP_CACHE_MAX_SIZE,
+    ttl=settings.MEMBERSHIP_CACHE_TTL_SECONDS,
+)
+
+
+async def is_member(db: AsyncSession, chat_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    if membership_cache.get((user_id, chat_id)):
+        return True
+    res = await db.execute(select(ChatUser.id).where(ChatUser.chat_id == chat_id, ChatUser.user_id == user_id))
+    found = res.first() is not None
+    if found:
+        membership_cache.set((user_id, chat_id), True)
+    return found
+
+
+def remember(user_id: uuid.UUID, chat_ids: Iterable[uuid.UUID]) -> None:
+    """Populate the cache in bulk from memberships the caller just loaded."""
+    for chat_id in chat_ids:
+        membership_cache.set((user_id, chat_id), True)
+
+
+def invalidate(user_id: uuid.UUID, chat_id: uuid.UUID) -> None:
+    """Call after writing or deleting the (chat, user) ChatUser row."""
+    membership_cache.pop((user_id, chat_id))
+
+
+def stats() -> dict[str, int]:
+    return {
+        "hits": membership_cache.hits,
+        "misses": membership_cache.misses,
+        "cached": len(membership_cache),
+    }
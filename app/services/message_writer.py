@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from typing import Optional
+
+from app.core.config import get_settings
+from app.db.session import AsyncSessionLocal
+from app.models.message import Message
+from app.services.messages import NewMessage, create_message, write_messages
+
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriter:
+    """Group commit for inbound chat messages.
+
+    Messages submitted from all connections are collected for up to `window_ms` (or until
+    `max_batch` are waiting) and written with a single write_messages() transaction, i.e. one
+    multi-row INSERT ... RETURNING and one commit for the whole batch. Each submitter gets its own
+    stored row back. If a batch fails, its messages are retried one by one so a single bad row
+    (e.g. a chat deleted meanwhile) only fails its own sender.
+    """
+
+    def __init__(self, window_ms: float, max_batch: int) -> None:
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self.messages = 0
+        self._queue: asyncio.Queue[tuple[NewMessage, asyncio.Future]] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="message-writer")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while not self._queue.empty():
+            _, fut = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("Message writer stopped"))
+
+    async def submit(self, item: NewMessage) -> Message:
+        if self._task is None:
+            # Not running (disabled or outside the app lifespan): write directly
+            async with AsyncSessionLocal() as db:
+                return await create_message(db, item.chat_id, item.from_user_id, item.text_content, item.image_content)
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, fut))
+        return await fut
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            finally:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(RuntimeError("Message writer stopped"))
+
+    async def _flush(self, batch: list[tuple[NewMessage, asyncio.Future]]) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                messages = await write_messages(db, [item for item, _ in batch])
+        except Exception:
+            logger.warning("Batched message write failed; retrying %d messages individually", len(batch), exc_info=True)
+            for item, fut in batch:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        msg = await create_message(
+                            db, item.chat_id, item.from_user_id, item.text_content, item.image_content
+                        )
+                except Exception as exc:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                else:
+                    if not fut.done():
+                        fut.set_result(msg)
+            return
+        self.batches += 1
+        self.messages += len(batch)
+        for (_, fut), msg in zip(batch, messages):
+            if not fut.done():
+                fut.set_result(msg)
+
+
+_settings = get_settings()
+message_writer = MessageWriter(
+    window_ms=_settings.MESSAGE_WRITER_WINDOW_MS,
+    max_batch=_settings.MESSAGE_WRITER_MAX_BATCH,
+)
@@ -0,0 +1,117 @@
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional, Sequence
+
+from sqlalchemy import BigInteger, DateTime, column, func, insert, update, values
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chat import Chat, ChatUser
+from app.models.message import Message
+
+
+# Smallest step of a Postgres timestamp
+_TICK = timedelta(microseconds=1)
+
+
+@dataclass(frozen=True)
+class NewMessage:
+    chat_id: uuid.UUID
+    from_user_id: uuid.UUID
+    text_content: Optional[str]
+    image_content: Optional[str]
+
+
+async def write_messages(db: AsyncSession, items: Sequence[NewMessage]) -> list[Message]:
+    """Insert messages (possibly for many chats) and advance chat counters in one transaction.
+
+    Three statements regardless of batch size: claim seqs on every touched chat, one multi-row
+    INSERT ... RETURNING, and one update of the senders' read watermarks. Membership must already
+    have been checked by the caller. Commits the session; results are in `items` order.
+    """
+    ids = [uuid.uuid4() for _ in items]
+    per_chat: dict[uuid.UUID, list[int]] = {}
+    for i, item in enumerate(items):
+        per_chat.setdefault(item.chat_id, []).append(i)
+
+    # Claim the next seqs and record the last activity first. The row locks serialize inserts per
+    # chat; the deferred FK lets last_message_id point ahead. created_at is strictly after the previous
+    # message's even when this transaction started (now()) before the lock holder committed, so
+    # ordering by created_at always agrees with seq. A chat's messages within one batch get
+    # consecutive microseconds, ending at the returned last_activity_at.
+    claims = values(
+        column("chat_id", UUID(as_uuid=True)),
+        column("n", BigInteger),
+        column("last_id", UUID(as_uuid=True)),
+        name="claims",
+    ).data([(chat_id, len(idx), ids[idx[-1]]) for chat_id, idx in sorted(per_chat.items())])
+    res = await db.execute(
+        update(Chat)
+        .where(Chat.id == claims.c.chat_id)
+        .values(
+            message_count=Chat.message_count + claims.c.n,
+            last_message_id=claims.c.last_id,
+            last_activity_at=func.greatest(
+                func.coalesce(Chat.last_activity_at + _TICK, func.clock_timestamp()), func.clock_timestamp()
+            )
+            + (claims.c.n - 1) * _TICK,
+        )
+        .returning(Chat.id, Chat.message_count, Chat.last_activity_at)
+    )
+    rows: list[dict] = [{} for _ in items]
+    for chat_id, count, last_at in res.all():
+        idx = per_chat[chat_id]
+        first_seq = count - len(idx) + 1
+        for offset, i in enumerate(idx):
+            item = items[i]
+            rows[i] = {
+                "id": ids[i],
+                "chat_id": chat_id,
+                "from_user_id": item.from_user_id,
+                "seq": first_seq + offset,
+                "text_content": item.text_content,
+                "image_content": item.image_content,
+                "created_at": last_at - (len(idx) - 1 - offset) * _TICK,
+            }
+    if any(not row for row in rows):
+        raise LookupError("Chat not found")
+
+    inserted = await db.scalars(insert(Message).returning(Message, sort_by_parameter_order=True), rows)
+    messages = list(inserted.all())
+
+    # Writing a message means the sender has read the chat up to it
+    newest_by_sender: dict[tuple[uuid.UUID, uuid.UUID], Message] = {}
+    for msg in messages:
+        newest_by_sender[(msg.chat_id, msg.from_user_id)] = msg  # seqs ascend in items order per chat
+    reads = values(
+        column("chat_id", UUID(as_uuid=True)),
+        column("user_id", UUID(as_uuid=True)),
+        column("seq", BigInteger),
+        column("message_id", UUID(as_uuid=True)),
+        column("read_at", DateTime(timezone=True)),
+        name="reads",
+    ).data([(m.chat_id, m.from_user_id, m.seq, m.id, m.created_at) for m in newest_by_sender.values()])
+    await db.execute(
+        update(ChatUser)
+        .where(
+            ChatUser.chat_id == reads.c.chat_id,
+            ChatUser.user_id == reads.c.user_id,
+            ChatUser.last_read_seq < reads.c.seq,
+        )
+        .values(last_read_seq=reads.c.seq, last_read_message_id=reads.c.message_id, last_read_at=reads.c.read_at)
+    )
+    await db.commit()
+    return messages
+
+
+async def create_message(
+    db: AsyncSession,
+    chat_id: uuid.UUID,
+    from_user_id: uuid.UUID,
+    text_content: Optional[str],
+    image_content: Optional[str],
+) -> Message:
+    """Insert a single message; see write_messages. Commits the session."""
+    (msg,) = await write_messages(db, [NewMessage(chat_id, from_user_id, text_content, image_content)])
+    return msg
@@ -0,0 +1,63 @@
+import time
+import uuid
+from typing import Any, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.models.user import User
+
+
+settings = get_settings()
+
+# Decoded token -> subject. Entries never outlive the token's own `exp`.
+token_cache: TTLCache[str, uuid.UUID] = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_SIZE,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+)
+# User id -> column snapshot of the user row (without the password hash)
+user_cache: TTLCache[uuid.UUID, dict[str, Any]] = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_SIZE,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+)
+
+_SNAPSHOT_EXCLUDE = {"password_hash"}
+
+
+def cached_subject(token: str) -> Optional[uuid.UUID]:
+    return token_cache.get(token)
+
+
+def remember_subject(token: str, user_id: uuid.UUID, payload: dict[str, Any]) -> None:
+    exp = payload.get("exp")
+    ttl = settings.AUTH_CACHE_TTL_SECONDS if exp is None else float(exp) - time.time()
+    token_cache.set(token, user_id, ttl)
+
+
+def cached_user(user_id: uuid.UUID) -> Optional[User]:
+    """A fresh transient User built from the snapshot, so requests never share an instance."""
+    snapshot = user_cache.get(user_id)
+    return User(**snapshot) if snapshot is not None else None
+
+
+def remember_user(user: User) -> None:
+    snapshot = {
+        attr.key: getattr(user, attr.key)
+        for attr in User.__mapper__.column_attrs
+        if attr.key not in _SNAPSHOT_EXCLUDE
+    }
+    user_cache.set(user.id, snapshot)
+
+
+def invalidate_user(user_id: uuid.UUID) -> None:
+    """Call whenever a user's profile columns change."""
+    user_cache.pop(user_id)
+
+
+def stats() -> dict[str, int]:
+    return {
+        "token_hits": token_cache.hits,
+        "token_misses": token_cache.misses,
+        "user_hits": user_cache.hits,
+        "user_misses": user_cache.misses,
+        "users_cached": len(user_cache),
+    }
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable, Optional, Sequence
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.db.session import AsyncSessionLocal
+from app.models.chat import ChatUser
+from app.models.message import Message
+from app.schemas.message import MessageSeenOut
+
+
+logger = logging.getLogger(__name__)
+
+
+async def mark_read(
+    db: AsyncSession,
+    chat_id: uuid.UUID,
+    user_id: uuid.UUID,
+    message_ids: Iterable[uuid.UUID],
+) -> Optional[tuple[uuid.UUID, list[uuid.UUID]]]:
+    """Advance the (chat, user) read watermark to the newest of `message_ids`.
+
+    A single statement validates the ids against the chat (foreign ids are ignored), moves the
+    watermark forward only, and reports which of the requested ids it newly covered, so repeated
+    or partially-seen batches are harmless. Returns (watermark message id, newly seen ids), or
+    None when the watermark did not move. Commits the session.
+    """
+    ids = list(set(message_ids))
+    if not ids:
+        return None
+
+    requested = (
+        select(Message.id, Message.seq)
+        .where(Message.chat_id == chat_id, Message.id.in_(ids))
+        .cte("requested")
+    )
+    newest = select(requested.c.id, requested.c.seq).order_by(requested.c.seq.desc()).limit(1).subquery("newest")
+    previous = aliased(ChatUser, name="previous")  # pre-update row: FROM scans see the statement snapshot
+    newly_seen = (
+        select(func.array_agg(requested.c.id))
+        .where(requested.c.seq > previous.last_read_seq)
+        .scalar_subquery()
+    )
+    res = await db.execute(
+        update(ChatUser)
+        .where(
+            ChatUser.chat_id == chat_id,
+            ChatUser.user_id == user_id,
+            previous.id == ChatUser.id,
+            ChatUser.last_read_seq < newest.c.seq,
+        )
+        .values(last_read_seq=newest.c.seq, last_read_message_id=newest.c.id, last_read_at=func.now())
+        .returning(newest.c.id, newly_seen)
+    )
+    row = res.first()
+    await db.commit()
+    if row is None:
+        return None
+    return row[0], list(row[1] or [])
+
+
+OnRead = Callable[[uuid.UUID, uuid.UUID, uuid.UUID, list[uuid.UUID]], Awaitable[None]]
+
+
+class SeenCoalescer:
+    """Merges seen events for the same (chat, user) that arrive within `window_ms`.
+
+    The first event for a key opens a window; later ones only add ids. When the window closes
+    the union is written with one mark_read() and `on_read(chat_id, user_id, last_read_id,
+    newly_seen_ids)` is called if the watermark moved.
+    """
+
+    def __init__(self, window_ms: float, on_read: OnRead) -> None:
+        self.window = window_ms / 1000
+        self.on_read = on_read
+        self._pending: dict[tuple[uuid.UUID, uuid.UUID], set[uuid.UUID]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, chat_id: uuid.UUID, user_id: uuid.UUID, message_ids: Sequence[uuid.UUID]) -> None:
+        if not message_ids:
+            return
+        key = (chat_id, user_id)
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.update(message_ids)
+            return
+        self._pending[key] = set(message_ids)
+        task = asyncio.create_task(self._flush_later(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self) -> None:
+        """Write every open window now instead of dropping it; call on shutdown."""
+        for key in list(self._pending):
+            await self._flush(key)
+        # The timers find their windows already written and return
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _flush_later(self, key: tuple[uuid.UUID, uuid.UUID]) -> None:
+        await asyncio.sleep(self.window)
+        await self._flush(key)
+
+    async def _flush(self, key: tuple[uuid.UUID, uuid.UUID]) -> None:
+        ids = self._pending.pop(key, None)
+        if not ids:
+            return
+        chat_id, user_id = key
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await mark_read(db, chat_id, user_id, ids)
+            if result:
+                await self.on_read(chat_id, user_id, *result)
+        except Exception:
+            logger.exception("Failed to record seen receipts for chat %s", chat_id)
+
+
+def receipts_for(
+    message: Message,
+    watermarks: Sequence[tuple[uuid.UUID, int, Optional[datetime]]],
+) -> list[MessageSeenOut]:
+    """Derive per-message receipts from (user_id, last_read_seq, last_read_at) watermarks.
+
+    `seen_at` is when the reader's watermark last moved, which may be later than when this
+    particular message was first displayed.
+    """
+    return [
+        MessageSeenOut(user_id=uid, seen_at=read_at)
+        for uid, read_seq, read_at in watermarks
+        if uid != message.from_user_id and read_seq >= message.seq and read_at is not None
+    ]
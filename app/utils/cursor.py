@@ -0,0 +1,22 @@
+import base64
+import uuid
+from datetime import datetime
+
+
+def encode_cursor(created_at: datetime, item_id: uuid.UUID) -> str:
+    """Opaque keyset cursor for rows ordered by (created_at, id)."""
+    raw = f"{created_at.isoformat()}|{item_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, item_id = raw.split("|", 1)
+        created_at = datetime.fromisoformat(ts)
+        if created_at.tzinfo is None:
+            raise ValueError("cursor timestamp must be timezone-aware")
+        return created_at, uuid.UUID(item_id)
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
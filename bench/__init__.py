@@ -0,0 +1,2 @@
+"""Benchmarks. Not part of the application image; run from the repository root, e.g.
+``python -m bench.broadcast_cpu``."""
@@ -0,0 +1,58 @@
+"""CPU cost of encoding WebSocket frames: the previous json path against app.realtime.frames.
+
+    python -m bench.broadcast_cpu [--number 20000]
+
+Needs no database; messages are transient ORM objects.
+"""
+import argparse
+import json
+import timeit
+import uuid
+from datetime import datetime, timezone
+
+from app.models.message import Message
+from app.realtime import frames
+from app.schemas.message import MessageOut
+
+
+def _message() -> Message:
+    return Message(
+        id=uuid.uuid4(),
+        chat_id=uuid.uuid4(),
+        from_user_id=uuid.uuid4(),
+        seq=42,
+        text_content="Lorem ipsum dolor sit amet, consectetur adipiscing elit " * 3,
+        image_content=None,
+        created_at=datetime.now(timezone.utc),
+    )
+
+
+def legacy_message_frame(msg: Message) -> str:
+    out = MessageOut.model_validate(msg)
+    return json.dumps({"type": "message", "chat_id": str(msg.chat_id), "message": out.model_dump(mode="json")}, default=str)
+
+
+def legacy_pong() -> str:
+    return json.dumps({"type": "pong"})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    msg = _message()
+    cases = {
+        "message frame (json)": lambda: legacy_message_frame(msg),
+        "message frame (frames)": lambda: frames.message_event(msg, msg.chat_id).encode("json"),
+        "message frame (+msgpack)": lambda: frames.message_event(msg, msg.chat_id).encode("msgpack"),
+        "pong (json)": legacy_pong,
+        "pong (frames)": lambda: frames.PONG.encode("json"),
+    }
+    for name, fn in cases.items():
+        seconds = min(timeit.repeat(fn, number=args.number, repeat=5))
+        print(f"{name:<26} {seconds / args.number * 1e6:8.2f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
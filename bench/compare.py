@@ -0,0 +1,53 @@
+"""Compare two bench.rest JSON reports.
+
+    python -m bench.compare results/before.json results/after.json
+
+Prints throughput, p50/p95/p99 and SQL statements per request side by side for every endpoint
+present in both reports, with the relative change.
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Optional
+
+
+def _metrics(endpoint: dict[str, Any]) -> dict[str, Optional[float]]:
+    sql = endpoint.get("sql_per_request")
+    return {
+        "req/s": endpoint["throughput_rps"],
+        "p50 ms": endpoint["latency_ms"]["p50"],
+        "p95 ms": endpoint["latency_ms"]["p95"],
+        "p99 ms": endpoint["latency_ms"]["p99"],
+        "sql/req": sql["mean"] if sql else None,
+    }
+
+
+def _change(before: Optional[float], after: Optional[float]) -> str:
+    if before is None or after is None:
+        return ""
+    if before == 0:
+        return "" if after == 0 else "new"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    args = parser.parse_args()
+
+    before = json.loads(args.before.read_text())
+    after = json.loads(args.after.read_text())
+    for report, path in ((before, args.before), (after, args.after)):
+        meta = report["meta"]
+        print(f"{path}: {meta['git_revision']} {meta['mode']} c={meta['concurrency']} {meta['dataset']}")
+
+    for name in before["endpoints"].keys() & after["endpoints"].keys():
+        print(f"\n{name}")
+        old, new = _metrics(before["endpoints"][name]), _metrics(after["endpoints"][name])
+        for metric in old:
+            print(f"  {metric:<8} {str(old[metric]):>10} {str(new[metric]):>10} {_change(old[metric], new[metric]):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""REST load test: throughput, latency percentiles and SQL statements per request, per endpoint.
+
+    python -m bench.rest --mode asgi --concurrency 32 --requests 2000 --out results/asgi.json
+    python -m bench.rest --mode uvicorn --workers 1 --out results/uvicorn.json
+    python -m bench.rest --mode uvicorn --base-url http://127.0.0.1:8000
+    python -m bench.rest --mode uvicorn --idle-sockets 3000 --out idle.json
+
+Run against a database seeded with `python -m bench.seed`. `asgi` drives the app in this process
+through httpx's ASGI transport and counts SQL statements per request. `uvicorn` starts a server
+(or uses --base-url) and goes over real sockets; SQL counts are then taken from the
+X-DB-Query-Count response header when the server sends one.
+
+--idle-sockets keeps that many authenticated `/ws` connections open, silent, for the whole run, so
+REST latency can be compared with and without a crowd of idle WebSocket clients on the same pool.
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import httpx
+from sqlalchemy import select
+from websockets.asyncio.client import ClientConnection, connect
+
+from app.core import profiler
+from app.core.security import create_access_token
+from app.db.session import AsyncSessionLocal, engine
+from app.models.chat import ChatUser
+from app.models.user import User
+from bench.seed import BENCH_PASSWORD, FIRST_NAMES, LAST_NAMES, USERNAME_PREFIX, WORDS
+from bench.server import dataset_size, git_revision, raise_fd_limit, start_uvicorn, stop, wait_healthy
+
+
+ENDPOINTS = ("chats", "chat", "search", "fuzzy_search", "message_search", "login")
+
+Request = tuple[str, str, dict[str, Any]]
+
+
+# --- SQL statements per request (asgi mode) ---
+
+
+class CountingApp:
+    """ASGI wrapper recording how many statements each request executed, keyed by X-Bench-Id."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        self.counts: dict[str, int] = {}
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with profiler.capture() as profile:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                bench_id = dict(scope["headers"]).get(b"x-bench-id")
+                if bench_id:
+                    self.counts[bench_id.decode()] = profile.count
+
+
+# --- Workload ---
+
+
+class Workload:
+    """Request generators over a sample of seeded users and the chats they belong to."""
+
+    def __init__(self, users: list[tuple[str, str]], chats_by_user: dict[str, list[str]], seed: int) -> None:
+        self.users = users
+        self.chats_by_user = chats_by_user
+        self.tokens = {uid: create_access_token(uid) for uid, _ in users}
+        self.rng = random.Random(seed)
+
+    @classmethod
+    async def load(cls, sample: int, seed: int) -> "Workload":
+        async with AsyncSessionLocal() as db:
+            res = await db.execute(
+                select(User.id, User.username)
+                .where(User.username.like(f"{USERNAME_PREFIX}%"))
+                .order_by(User.username)
+                .limit(sample)
+            )
+            users = [(str(uid), name) for uid, name in res.all()]
+            if not users:
+                raise SystemExit("No seeded users found; run `python -m bench.seed` first")
+            res = await db.execute(
+                select(ChatUser.user_id, ChatUser.chat_id).where(ChatUser.user_id.in_([u for u, _ in users]))
+            )
+            chats_by_user: dict[str, list[str]] = defaultdict(list)
+            for uid, cid in res.all():
+                chats_by_user[str(uid)].append(str(cid))
+        return cls([u for u in users if chats_by_user.get(u[0])], chats_by_user, seed)
+
+    def _auth(self, uid: str) -> dict[str, Any]:
+        return {"headers": {"Authorization": f"Bearer {self.tokens[uid]}"}}
+
+    def chats(self) -> Request:
+        uid, _ = self.rng.choice(self.users)
+        return "GET", "/chats?limit=20", self._auth(uid)
+
+    def chat(self) -> Request:
+        uid, _ = self.rng.choice(self.users)
+        chat_id = self.rng.choice(self.chats_by_user[uid])
+        return "GET", f"/chats/{chat_id}?limit=50", self._auth(uid)
+
+    def search(self) -> Request:
+        uid, _ = self.rng.choice(self.users)
+        _, other = self.rng.choice(self.users)
+        # Prefix of another user's username, 3 to 8 characters
+        q = other[: self.rng.randint(3, 8)]
+        return "GET", f"/search?q={q}&limit=20", self._auth(uid)
+
+    def fuzzy_search(self) -> Request:
+        uid, _ = self.rng.choice(self.users)
+        # "first last" with one letter dropped: a typo only trigram similarity can match. Seeded
+        # names repeat, so this ranks a large share of all users (the expensive case)
+        name = f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+        drop = self.rng.randrange(len(name))
+        return "GET", f"/search?q={name[:drop] + name[drop + 1:]}&mode=fuzzy&limit=20", self._auth(uid)
+
+    def message_search(self) -> Request:
+        uid, _ = self.rng.choice(self.users)
+        # Every seeded word matches a large share of all messages
+        return "GET", f"/chats/search?q={self.rng.choice(WORDS)}&limit=20", self._auth(uid)
+
+    def login(self) -> Request:
+        _, name = self.rng.choice(self.users)
+        return "POST", "/login", {"json": {"username_or_email": name, "password": BENCH_PASSWORD}}
+
+
+# --- Idle WebSocket clients (uvicorn mode) ---
+
+
+async def open_idle_sockets(ws_url: str, tokens: list[str], count: int, per_second: int = 500) -> list[ClientConnection]:
+    """Open `count` /ws connections, cycling through `tokens`, and leave them idle."""
+    sockets: list[ClientConnection] = []
+    for i in range(count):
+        try:
+            sockets.append(await connect(f"{ws_url}/ws?token={tokens[i % len(tokens)]}", open_timeout=30))
+        except Exception as exc:
+            raise SystemExit(f"Could not open idle socket {i + 1}/{count}: {exc!r}")
+        if i % per_second == per_second - 1:
+            await asyncio.sleep(1.0)
+    return sockets
+
+
+# --- Runner ---
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient,
+    make_request: Callable[[], Request],
+    total: int,
+    concurrency: int,
+    counter: Optional[CountingApp],
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    statements: list[int] = []
+    errors: dict[str, int] = defaultdict(int)
+    issued = 0
+
+    async def worker() -> None:
+        nonlocal issued
+        while issued < total:
+            issued += 1
+            bench_id = str(issued)
+            method, url, kwargs = make_request()
+            kwargs.setdefault("headers", {})["X-Bench-Id"] = bench_id
+            started = time.perf_counter()
+            try:
+                resp = await client.request(method, url, **kwargs)
+            except httpx.HTTPError as exc:
+                errors[type(exc).__name__] += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            if resp.status_code >= 400:
+                errors[str(resp.status_code)] += 1
+            if counter is not None:
+                statements.append(counter.counts.pop(bench_id, 0))
+            elif "x-db-query-count" in resp.headers:
+                statements.append(int(resp.headers["x-db-query-count"]))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": dict(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+        "sql_per_request": (
+            {"mean": round(sum(statements) / len(statements), 2), "max": max(statements)} if statements else None
+        ),
+    }
+
+
+async def bench(args: argparse.Namespace) -> dict[str, Any]:
+    workload = await Workload.load(args.sample_users, args.seed)
+    dataset = await dataset_size()
+    requests = {name: args.requests for name in args.endpoints}
+    if "login" in requests:
+        requests["login"] = args.login_requests
+
+    server: Optional[subprocess.Popen] = None
+    counter: Optional[CountingApp] = None
+    lifespan = None
+    idle: list[ClientConnection] = []
+    if args.idle_sockets and args.mode != "uvicorn":
+        raise SystemExit("--idle-sockets needs --mode uvicorn")
+    if args.mode == "asgi":
+        from app.main import app
+
+        counter = CountingApp(app)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=counter), base_url="http://bench")
+    else:
+        base_url = args.base_url
+        if base_url is None:
+            base_url = f"http://127.0.0.1:{args.port}"
+            server = start_uvicorn(args.port, args.workers)
+        await wait_healthy(base_url)
+        if args.idle_sockets:
+            raise_fd_limit()
+            print(f"  opening {args.idle_sockets} idle sockets", flush=True)
+            idle = await open_idle_sockets(base_url.replace("http", "ws", 1), list(workload.tokens.values()), args.idle_sockets)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        client = httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60)
+
+    results: dict[str, Any] = {}
+    try:
+        for name in args.endpoints:
+            make_request = getattr(workload, name)
+            if args.warmup:
+                await run_endpoint(client, make_request, min(args.warmup, requests[name]), args.concurrency, counter)
+            print(f"  {name}: {requests[name]} requests, concurrency {args.concurrency}", flush=True)
+            results[name] = await run_endpoint(client, make_request, requests[name], args.concurrency, counter)
+    finally:
+        await client.aclose()
+        # Still open at the end means none was dropped while the endpoints ran
+        idle_open = sum(1 for ws in idle if ws.close_code is None)
+        await asyncio.gather(*(ws.close() for ws in idle), return_exceptions=True)
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+        stop(server)
+        await engine.dispose()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "uvicorn" and not args.base_url else None,
+            "concurrency": args.concurrency,
+            "idle_sockets": {"opened": len(idle), "open_at_end": idle_open} if idle else None,
+            "sample_users": len(workload.users),
+            "seed": args.seed,
+            "dataset": dataset,
+        },
+        "endpoints": results,
+    }
+
+
+def _print_table(report: dict[str, Any]) -> None:
+    print(f"{'endpoint':<14} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sql/req':>8} {'errors':>7}")
+    for name, r in report["endpoints"].items():
+        sql = r["sql_per_request"]["mean"] if r["sql_per_request"] else "-"
+        lat = r["latency_ms"]
+        print(
+            f"{name:<14} {r['throughput_rps']:>9} {lat['p50']:>9} {lat['p95']:>9} {lat['p99']:>9} "
+            f"{sql:>8} {sum(r['errors'].values()):>7}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--base-url", help="uvicorn mode: use a running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765, help="uvicorn mode: port for the started server")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn mode: workers for the started server")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--idle-sockets", type=int, default=0, help="uvicorn mode: idle /ws connections held open")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1_000, help="Requests per endpoint")
+    parser.add_argument("--login-requests", type=int, default=100, help="Requests for /login (bcrypt-bound)")
+    parser.add_argument("--warmup", type=int, default=50, help="Unrecorded requests per endpoint first")
+    parser.add_argument("--sample-users", type=int, default=200, help="Seeded users to act as")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", type=Path, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    report = asyncio.run(bench(args))
+    _print_table(report)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
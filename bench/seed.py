@@ -0,0 +1,162 @@
+"""Seed the configured database with a reproducible synthetic data set.
+
+    python -m bench.seed --users 2000 --chats 5000 --messages 100 --reset
+
+Uses DATABASE_URL from the environment, like the app. Every user's password is BENCH_PASSWORD.
+The same arguments and --seed always produce the same ids and rows, so benchmark runs against
+separately seeded databases are comparable. --reset empties the app's tables first.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, text
+
+from app.core.security import get_password_hash
+from app.db.session import engine
+from app.models.chat import Chat, ChatUser
+from app.models.message import Message
+from app.models.user import User
+
+
+BENCH_PASSWORD = "bench-password"
+USERNAME_PREFIX = "bench"
+BATCH_ROWS = 5_000
+
+FIRST_NAMES = ["Anna", "Boris", "Daria", "Egor", "Irina", "Ivan", "Maria", "Nikita", "Olga", "Pavel", "Sofia", "Timur"]
+LAST_NAMES = ["Ivanov", "Petrova", "Smirnov", "Kuznetsova", "Popov", "Volkova", "Sokolov", "Lebedeva", "Kozlov", "Novikova"]
+# Message vocabulary; small, so every word is a common search term (the expensive case)
+WORDS = (
+    "hello meeting tomorrow deploy release review database index query latency cache socket message "
+    "chat search backend frontend coffee lunch weekend project deadline ticket fix bug test please thanks"
+).split()
+
+
+def username(i: int) -> str:
+    return f"{USERNAME_PREFIX}{i:07d}"
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _group_size(spec: str) -> tuple[int, int]:
+    low, _, high = spec.partition(":")
+    return int(low), int(high or low)
+
+
+async def _insert(conn, table, rows: list[dict]) -> None:
+    for start in range(0, len(rows), BATCH_ROWS):
+        await conn.execute(insert(table), rows[start : start + BATCH_ROWS])
+
+
+async def seed(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    group_min, group_max = _group_size(args.group_size)
+    if args.users < max(2, group_max):
+        raise SystemExit("--users must be at least 2 and at least the largest group size")
+
+    async with engine.begin() as conn:
+        existing = (await conn.execute(text('SELECT count(*) FROM (SELECT 1 FROM "user" LIMIT 1) s'))).scalar()
+        if existing and not args.reset:
+            raise SystemExit("Database is not empty; pass --reset to truncate the app's tables first")
+        if args.reset:
+            await conn.execute(text('TRUNCATE "user", chat, chatuser, message, wsevent'))
+
+    started = time.perf_counter()
+    # One real hash shared by every user: hashing is not what is being seeded
+    password_hash = get_password_hash(BENCH_PASSWORD)
+    epoch = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    users = []
+    for i in range(args.users):
+        users.append(
+            {
+                "id": _uuid(rng),
+                "email": f"{username(i)}@bench.local",
+                "username": username(i),
+                "password_hash": password_hash,
+                "first_name": rng.choice(FIRST_NAMES),
+                "last_name": rng.choice(LAST_NAMES),
+                "last_seen": epoch,
+            }
+        )
+    async with engine.begin() as conn:
+        await _insert(conn, User.__table__, users)
+    user_ids = [u["id"] for u in users]
+
+    # Chats are written in chunks, each in its own transaction with its members and messages
+    # (the chat -> last message FK is deferred to commit).
+    total_messages = 0
+    for chunk_start in range(0, args.chats, args.chunk):
+        chats, members, messages = [], [], []
+        for _ in range(chunk_start, min(args.chats, chunk_start + args.chunk)):
+            is_group = rng.random() < args.group_ratio
+            size = rng.randint(group_min, group_max) if is_group else 2
+            participants = rng.sample(user_ids, size)
+            chat_id = _uuid(rng)
+            count = rng.randint(0, 2 * args.messages)
+            at = epoch + timedelta(seconds=rng.randint(0, 86_400 * 30))
+            last_id = None
+            for seq in range(1, count + 1):
+                at += timedelta(seconds=rng.randint(1, 600))
+                last_id = _uuid(rng)
+                messages.append(
+                    {
+                        "id": last_id,
+                        "chat_id": chat_id,
+                        "from_user_id": rng.choice(participants),
+                        "seq": seq,
+                        "text_content": " ".join(rng.choices(WORDS, k=rng.randint(1, 20))),
+                        "image_content": None,
+                        "created_at": at,
+                    }
+                )
+            chats.append(
+                {
+                    "id": chat_id,
+                    "is_group": is_group,
+                    "name": f"Group {chat_id.hex[:6]}" if is_group else None,
+                    "avatar": None,
+                    "created_at": epoch,
+                    "last_message_id": last_id,
+                    "last_activity_at": at if count else None,
+                    "message_count": count,
+                }
+            )
+            for uid in participants:
+                members.append({"chat_id": chat_id, "user_id": uid, "last_read_seq": rng.randint(0, count)})
+        async with engine.begin() as conn:
+            await _insert(conn, Chat.__table__, chats)
+            await _insert(conn, ChatUser.__table__, members)
+            await _insert(conn, Message.__table__, messages)
+        total_messages += len(messages)
+        print(f"  chats {min(args.chats, chunk_start + args.chunk)}/{args.chats}, messages {total_messages}", flush=True)
+
+    async with engine.begin() as conn:
+        await conn.execute(text('ANALYZE "user", chat, chatuser, message'))
+    await engine.dispose()
+    print(
+        f"Seeded {args.users} users, {args.chats} chats, {total_messages} messages "
+        f"in {time.perf_counter() - started:.1f}s (password: {BENCH_PASSWORD})"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--chats", type=int, default=2_000)
+    parser.add_argument("--messages", type=int, default=50, help="Mean messages per chat (uniform 0..2x)")
+    parser.add_argument("--group-ratio", type=float, default=0.2, help="Share of chats that are groups")
+    parser.add_argument("--group-size", default="3:20", help="Group size, N or MIN:MAX")
+    parser.add_argument("--chunk", type=int, default=500, help="Chats per transaction")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reset", action="store_true", help="Truncate the app's tables first")
+    asyncio.run(seed(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Helpers shared by the benchmark runners: a uvicorn server under test and run metadata."""
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from sqlalchemy import text
+
+from app.db.session import engine
+
+
+def start_uvicorn(port: int, workers: int = 1, env: Optional[dict[str, str]] = None) -> subprocess.Popen:
+    """Start the app; `env` entries override this process's environment (i.e. the app settings)."""
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers), "--no-access-log"],
+        env={**os.environ, **env} if env else None,
+    )
+
+
+def stop(server: Optional[subprocess.Popen]) -> None:
+    if server is not None:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+async def wait_healthy(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while True:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise SystemExit(f"Server at {base_url} did not become healthy")
+            await asyncio.sleep(0.2)
+
+
+def raise_fd_limit() -> None:
+    """Allow as many open sockets as the hard limit permits."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def rss_bytes(pid: int) -> int:
+    """Resident memory of a process and its children (uvicorn workers), from /proc. Linux only."""
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            status = Path(f"/proc/{current}/status").read_text()
+            children = Path(f"/proc/{current}/task/{current}/children").read_text().split()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith("VmRSS:"):
+                total += int(line.split()[1]) * 1024
+        pids.extend(int(c) for c in children)
+    return total
+
+
+async def dataset_size() -> dict[str, int]:
+    # Planner statistics rather than count(*): instant at any scale, exact right after bench.seed's ANALYZE
+    async with engine.connect() as conn:
+        res = await conn.execute(
+            text("SELECT relname, reltuples::bigint FROM pg_class WHERE relname IN ('user', 'chat', 'chatuser', 'message')")
+        )
+        return {name: int(rows) for name, rows in res.all()}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
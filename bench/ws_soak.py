@@ -0,0 +1,428 @@
+"""WebSocket fan-out soak test: end-to-end delivery latency, drops and reconnects under load.
+
+    python -m bench.ws_soak --sockets 2000 --group-size 2:50 --rate 200 --duration 60 --out soak.json
+    python -m bench.ws_soak --base-url http://127.0.0.1:8000 --server-pid 12345
+    python -m bench.ws_soak --sockets 1000 --rate 50 --login-rate 20 --out storm.json
+    python -m bench.ws_soak --group-size 20:50 --rate 2000 --message-writer off --out per-message.json
+
+Run against a database seeded with `python -m bench.seed`. Picks seeded chats whose member count
+falls in --group-size and opens one socket per (member, chat) until --sockets is reached. A share of
+members (--all-share) use the single `/ws` endpoint, the rest `/ws/chats/{chat_id}`. Messages are
+sent at --rate per second through random members and each copy is timed from send to receive.
+
+Unless --base-url is given a single uvicorn process is started, and its resident memory is sampled
+every second. All sockets live in this one client process. The report therefore includes the client
+event loop's worst lag: if it is high, the latencies measure the client, not the server.
+
+--login-rate adds a login storm: that many `POST /login` per second (seeded users, real password
+checks) for the whole sending period, so WebSocket delivery latency can be compared with and
+without password hashing load. The report then includes login throughput, latency and statuses
+(503 when the hashing pool sheds load).
+
+--message-writer on|off starts the server with the group-commit writer enabled or disabled
+(MESSAGE_WRITER_ENABLED), to compare batched and per-message commits at the same --rate;
+`stored_per_second` counts messages that reached at least one socket.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+from sqlalchemy import func, select
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed, InvalidStatus
+
+from app.core.security import create_access_token
+from app.db.session import AsyncSessionLocal, engine
+from app.models.chat import ChatUser
+from app.models.user import User
+from bench.rest import percentile
+from bench.seed import BENCH_PASSWORD, USERNAME_PREFIX
+from bench.server import dataset_size, git_revision, raise_fd_limit, rss_bytes, start_uvicorn, stop, wait_healthy
+
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1_000, 2_000, 5_000)
+
+
+@dataclass(eq=False)
+class Socket:
+    user_id: str
+    path: str
+    ws: Optional[ClientConnection] = None
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+@dataclass
+class Sent:
+    at: float
+    expected: int
+    received: int = 0
+
+
+class Soak:
+    def __init__(self, args: argparse.Namespace, ws_url: str) -> None:
+        self.args = args
+        self.ws_url = ws_url
+        self.rng = random.Random(args.seed)
+        self.sockets: list[Socket] = []
+        self.by_chat: dict[str, list[Socket]] = defaultdict(list)
+        self.sent: dict[str, Sent] = {}
+        self.latencies: list[float] = []
+        self.late_or_unknown = 0
+        self.duplicates = 0
+        self.connect_failures = 0
+        self.reconnects = 0
+        self.close_codes: dict[str, int] = defaultdict(int)
+        self.send_errors = 0
+        self.loop_lag_max_ms = 0.0
+        self.rss_samples: list[int] = []
+        self.login_names: list[str] = []
+        self.login_latencies: list[float] = []
+        self.login_statuses: dict[str, int] = defaultdict(int)
+        self.stopping = False
+
+    async def plan(self) -> None:
+        """Choose chats and members from the seeded data and lay out the sockets."""
+        low, _, high = self.args.group_size.partition(":")
+        size_min, size_max = int(low), int(high or low)
+        async with AsyncSessionLocal() as db:
+            sizes = (
+                select(ChatUser.chat_id, func.count().label("members"))
+                .group_by(ChatUser.chat_id)
+                .having(func.count().between(size_min, size_max))
+                .subquery()
+            )
+            chat_ids = [str(c) for c in (await db.execute(select(sizes.c.chat_id).order_by(sizes.c.chat_id))).scalars()]
+            if not chat_ids:
+                raise SystemExit(f"No seeded chats with {size_min}..{size_max} members")
+            self.rng.shuffle(chat_ids)
+
+            planned = 0
+            users_all: dict[str, Socket] = {}
+            for chat_id in chat_ids:
+                if planned >= self.args.sockets:
+                    break
+                members = (
+                    await db.execute(
+                        select(ChatUser.user_id)
+                        .join(User, User.id == ChatUser.user_id)
+                        .where(ChatUser.chat_id == uuid.UUID(chat_id), User.username.like(f"{USERNAME_PREFIX}%"))
+                    )
+                ).scalars()
+                for user_id in map(str, members):
+                    if planned >= self.args.sockets:
+                        break
+                    if self.rng.random() < self.args.all_share:
+                        # One /ws socket per user, subscribed server-side to all of the user's chats
+                        sock = users_all.get(user_id)
+                        if sock is None:
+                            sock = users_all[user_id] = Socket(user_id, "/ws")
+                            self.sockets.append(sock)
+                            planned += 1
+                    else:
+                        sock = Socket(user_id, f"/ws/chats/{chat_id}")
+                        self.sockets.append(sock)
+                        planned += 1
+                    if sock not in self.by_chat[chat_id]:
+                        self.by_chat[chat_id].append(sock)
+
+            # A /ws socket receives every chat of its user, including planned chats it was not
+            # picked for; those copies are expected too.
+            for sock in users_all.values():
+                res = await db.execute(select(ChatUser.chat_id).where(ChatUser.user_id == uuid.UUID(sock.user_id)))
+                for chat_id in map(str, res.scalars()):
+                    if chat_id in self.by_chat and sock not in self.by_chat[chat_id]:
+                        self.by_chat[chat_id].append(sock)
+            if self.args.login_rate:
+                res = await db.execute(
+                    select(User.username).where(User.username.like(f"{USERNAME_PREFIX}%")).order_by(User.username).limit(500)
+                )
+                self.login_names = list(res.scalars())
+        self.tokens = {s.user_id: create_access_token(s.user_id) for s in self.sockets}
+
+    async def run_socket(self, sock: Socket) -> None:
+        backoff = 0.1
+        first = True
+        while not self.stopping:
+            try:
+                async with connect(
+                    f"{self.ws_url}{sock.path}?token={self.tokens[sock.user_id]}",
+                    open_timeout=30,
+                    max_queue=None,
+                ) as ws:
+                    if not first:
+                        self.reconnects += 1
+                    first, backoff = False, 0.1
+                    sock.ws = ws
+                    sock.ready.set()
+                    async for raw in ws:
+                        self.on_frame(raw)
+                    self.close_codes[str(ws.close_code)] += 1  # closed cleanly by the server
+            except ConnectionClosed as exc:
+                self.close_codes[str(exc.rcvd.code if exc.rcvd else None)] += 1
+            except (InvalidStatus, OSError, asyncio.TimeoutError):
+                self.connect_failures += 1
+            sock.ws = None
+            sock.ready.clear()
+            if self.stopping:
+                return
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 5.0)
+
+    def on_frame(self, raw: str | bytes) -> None:
+        now = time.perf_counter()
+        event = json.loads(raw)
+        if event.get("type") != "message":
+            return
+        text = event["message"].get("text_content") or ""
+        if not text.startswith("soak "):
+            return
+        nonce = text.split(" ", 2)[1]
+        sent = self.sent.get(nonce)
+        if sent is None:
+            self.late_or_unknown += 1
+            return
+        sent.received += 1
+        if sent.received > sent.expected:
+            self.duplicates += 1
+        self.latencies.append((now - sent.at) * 1000)
+
+    async def send_loop(self, duration: float) -> None:
+        chat_ids = list(self.by_chat)
+        interval = 1 / self.args.rate
+        next_at = time.perf_counter()
+        deadline = next_at + duration
+        while time.perf_counter() < deadline:
+            chat_id = self.rng.choice(chat_ids)
+            senders = [s for s in self.by_chat[chat_id] if s.ws is not None]
+            if senders:
+                sender = self.rng.choice(senders)
+                nonce = uuid.uuid4().hex
+                frame: dict[str, Any] = {"type": "message", "text_content": f"soak {nonce}"}
+                if sender.path == "/ws":
+                    frame["chat_id"] = chat_id
+                # Expected copies: every open socket receiving this chat, the sender's included
+                expected = sum(1 for s in self.by_chat[chat_id] if s.ws is not None)
+                self.sent[nonce] = Sent(time.perf_counter(), expected)
+                try:
+                    await sender.ws.send(json.dumps(frame))
+                except ConnectionClosed:
+                    self.send_errors += 1
+                    del self.sent[nonce]
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+
+    async def login_loop(self, base_url: str, duration: float) -> None:
+        """Open-loop logins at --login-rate: a slow server does not slow the request rate down."""
+        interval = 1 / self.args.login_rate
+        pending: set[asyncio.Task] = set()
+
+        async def login(client: httpx.AsyncClient) -> None:
+            started = time.perf_counter()
+            try:
+                resp = await client.post(
+                    "/login",
+                    json={"username_or_email": self.rng.choice(self.login_names), "password": BENCH_PASSWORD},
+                )
+            except httpx.HTTPError as exc:
+                self.login_statuses[type(exc).__name__] += 1
+                return
+            self.login_statuses[str(resp.status_code)] += 1
+            if resp.status_code == 200:
+                self.login_latencies.append((time.perf_counter() - started) * 1000)
+
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=None)) as client:
+            next_at = time.perf_counter()
+            deadline = next_at + duration
+            while time.perf_counter() < deadline:
+                task = asyncio.create_task(login(client))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                next_at += interval
+                await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def monitor(self, server_pid: Optional[int]) -> None:
+        while not self.stopping:
+            started = time.perf_counter()
+            await asyncio.sleep(1.0)
+            self.loop_lag_max_ms = max(self.loop_lag_max_ms, (time.perf_counter() - started - 1.0) * 1000)
+            if server_pid:
+                self.rss_samples.append(rss_bytes(server_pid))
+
+    def report(self, elapsed: float, connected: int) -> dict[str, Any]:
+        expected = sum(s.expected for s in self.sent.values())
+        received = sum(min(s.received, s.expected) for s in self.sent.values())
+        latencies = sorted(self.latencies)
+        buckets: dict[str, int] = {}
+        lower = 0.0
+        for bound in HISTOGRAM_BUCKETS_MS:
+            buckets[f"le_{bound}"] = sum(1 for v in latencies if lower < v <= bound) if latencies else 0
+            lower = bound
+        buckets["gt_max"] = sum(1 for v in latencies if v > HISTOGRAM_BUCKETS_MS[-1])
+        group_sizes = [len(m) for m in self.by_chat.values()]
+        return {
+            "sockets": {
+                "planned": len(self.sockets),
+                "connected": connected,
+                "endpoint_ws_all": sum(1 for s in self.sockets if s.path == "/ws"),
+                "chats": len(self.by_chat),
+                "max_group_sockets": max(group_sizes, default=0),
+                "connect_failures": self.connect_failures,
+                "reconnects": self.reconnects,
+                "close_codes": dict(self.close_codes),
+            },
+            "messages": {
+                "sent": len(self.sent),
+                "send_rate": round(len(self.sent) / elapsed, 1) if elapsed else 0.0,
+                "stored_per_second": (
+                    round(sum(1 for s in self.sent.values() if s.received) / elapsed, 1) if elapsed else 0.0
+                ),
+                "send_errors": self.send_errors,
+                "deliveries_expected": expected,
+                "deliveries_received": received,
+                "dropped": expected - received,
+                "drop_ratio": round((expected - received) / expected, 6) if expected else 0.0,
+                "duplicates": self.duplicates,
+                "unknown": self.late_or_unknown,
+            },
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50), 3),
+                "p90": round(percentile(latencies, 90), 3),
+                "p99": round(percentile(latencies, 99), 3),
+                "p999": round(percentile(latencies, 99.9), 3),
+                "max": round(latencies[-1], 3) if latencies else 0.0,
+                "histogram": buckets,
+            },
+            "server_rss_bytes": (
+                {"start": self.rss_samples[0], "peak": max(self.rss_samples), "end": self.rss_samples[-1]}
+                if self.rss_samples
+                else None
+            ),
+            "client_loop_lag_max_ms": round(self.loop_lag_max_ms, 1),
+            "login": self._login_report(elapsed) if self.args.login_rate else None,
+        }
+
+    def _login_report(self, elapsed: float) -> dict[str, Any]:
+        latencies = sorted(self.login_latencies)
+        return {
+            "rate": self.args.login_rate,
+            "statuses": dict(self.login_statuses),
+            "throughput_ok": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50), 3),
+                "p99": round(percentile(latencies, 99), 3),
+                "max": round(latencies[-1], 3) if latencies else 0.0,
+            },
+        }
+
+
+async def soak(args: argparse.Namespace) -> dict[str, Any]:
+    raise_fd_limit()
+    server = None
+    server_pid = args.server_pid
+    base_url = args.base_url
+    if base_url is not None and args.message_writer:
+        raise SystemExit("--message-writer only applies to the server this tool starts")
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.port}"
+        env = {"MESSAGE_WRITER_ENABLED": str(args.message_writer == "on").lower()} if args.message_writer else None
+        server = start_uvicorn(args.port, env=env)
+        server_pid = server.pid
+    await wait_healthy(base_url)
+
+    runner = Soak(args, base_url.replace("http", "ws", 1))
+    await runner.plan()
+    dataset = await dataset_size()
+    await engine.dispose()  # the client process needs no pool while soaking
+
+    tasks = []
+    monitor = asyncio.create_task(runner.monitor(server_pid))
+    try:
+        print(f"  connecting {len(runner.sockets)} sockets over {len(runner.by_chat)} chats", flush=True)
+        for i, sock in enumerate(runner.sockets):
+            tasks.append(asyncio.create_task(runner.run_socket(sock)))
+            if args.connect_rate and i % args.connect_rate == args.connect_rate - 1:
+                await asyncio.sleep(1.0)
+        try:
+            await asyncio.wait_for(asyncio.gather(*(s.ready.wait() for s in runner.sockets)), timeout=args.connect_timeout)
+        except asyncio.TimeoutError:
+            pass
+        connected = sum(1 for s in runner.sockets if s.ws is not None)
+        print(f"  {connected} connected; sending {args.rate}/s for {args.duration}s", flush=True)
+
+        started = time.perf_counter()
+        if args.login_rate:
+            await asyncio.gather(runner.send_loop(args.duration), runner.login_loop(base_url, args.duration))
+        else:
+            await runner.send_loop(args.duration)
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(args.drain)  # let in-flight deliveries arrive before counting drops
+    finally:
+        runner.stopping = True
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        monitor.cancel()
+        stop(server)
+
+    result = runner.report(elapsed, connected)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "base_url": base_url,
+            "sockets": args.sockets,
+            "group_size": args.group_size,
+            "all_share": args.all_share,
+            "rate": args.rate,
+            "login_rate": args.login_rate,
+            "message_writer": args.message_writer,
+            "duration_s": args.duration,
+            "seed": args.seed,
+            "dataset": dataset,
+        },
+        **result,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Use a running server (http://host:port) instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="With --base-url: process to sample RSS from")
+    parser.add_argument("--port", type=int, default=8766, help="Port for the started server")
+    parser.add_argument("--sockets", type=int, default=1_000)
+    parser.add_argument("--group-size", default="2:20", help="Member count of chats to use, N or MIN:MAX")
+    parser.add_argument("--all-share", type=float, default=0.5, help="Share of members connecting via /ws")
+    parser.add_argument("--rate", type=float, default=50.0, help="Messages sent per second, all chats together")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of sending")
+    parser.add_argument(
+        "--message-writer", choices=["on", "off"], help="Start the server with group commit on or off (default: settings)"
+    )
+    parser.add_argument("--login-rate", type=float, default=0.0, help="POST /login per second during sending (0: off)")
+    parser.add_argument("--drain", type=float, default=5.0, help="Seconds to wait for deliveries after sending")
+    parser.add_argument("--connect-rate", type=int, default=500, help="Sockets opened per second (0: all at once)")
+    parser.add_argument("--connect-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", type=Path, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    report = asyncio.run(soak(args))
+    print(json.dumps({k: report[k] for k in ("sockets", "messages", "latency_ms", "login")}, indent=2))
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
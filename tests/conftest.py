@@ -0,0 +1,119 @@
+"""Shared fixtures.
+
+Tests marked `requires_db` run against the database in DATABASE_URL, which must be migrated to
+head; they create their own users and chats under random names and are skipped when the variable
+is not set. Async tests run on one event loop for the whole session (anyio's pytest plugin), so
+the app's engine and lifespan are shared between them.
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+import httpx
+import pytest
+
+# Cheap hashes for the users the tests register; must be set before the app reads its settings
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+requires_db = pytest.mark.skipif(not os.environ.get("DATABASE_URL"), reason="DATABASE_URL is not set")
+
+
+@contextmanager
+def uvicorn_workers(env: dict[str, str], count: int = 2) -> Iterator[list[str]]:
+    """Run the app in `count` separate uvicorn processes; yields their "host:port"."""
+    ports = [_free_port() for _ in range(count)]
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--no-access-log"], env=env
+        )
+        for port in ports
+    ]
+    try:
+        urls = [f"127.0.0.1:{port}" for port in ports]
+        for url in urls:
+            _wait_healthy(f"http://{url}")
+        yield urls
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_healthy(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if httpx.get(f"{base_url}/health").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{base_url} did not become healthy")
+        time.sleep(0.2)
+
+
+@dataclass
+class Account:
+    id: str
+    username: str
+    headers: dict[str, str]
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def client():
+    from app.db.session import engine
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+            yield c
+    await engine.dispose()
+
+
+@pytest.fixture
+def query_budget():
+    """Assert a statement budget around part of a test:
+
+        async def test_chats(client, query_budget):
+            with query_budget(4, max_repeats=1) as profile:
+                await client.get("/chats", headers=...)
+
+    Fails with the executed statements listed when the block runs more than `max_queries`
+    statements, or one statement more than `max_repeats` times (see app.core.profiler).
+    """
+    from app.core import profiler
+
+    return profiler.query_budget
+
+
+@pytest.fixture
+def make_user(client: httpx.AsyncClient):
+    from app.core.security import create_access_token
+
+    async def make() -> Account:
+        name = f"t{uuid.uuid4().hex[:12]}"
+        resp = await client.post(
+            "/register", json={"email": f"{name}@example.com", "username": name, "password": "test-password"}
+        )
+        assert resp.status_code == 201, resp.text
+        user_id = resp.json()["id"]
+        return Account(user_id, name, {"Authorization": f"Bearer {create_access_token(user_id)}"})
+
+    return make
@@ -0,0 +1,83 @@
+"""Cross-worker delivery over the Postgres backplane, with two real uvicorn processes.
+
+A message sent on worker A must reach a socket on worker B, for each NOTIFY payload kind: plain
+JSON (`j`), zlib-compressed (`z`) and spilled to the wsevent table (`r`).
+"""
+import asyncio
+import json
+import os
+import random
+import uuid
+
+import httpx
+import pytest
+import websockets
+
+from app.core.security import create_access_token
+from tests.conftest import requires_db, uvicorn_workers
+
+pytestmark = [pytest.mark.anyio, requires_db]
+
+
+@pytest.fixture(scope="module")
+def workers():
+    with uvicorn_workers({**os.environ, "WS_BACKPLANE": "postgres", "MESSAGE_WRITER_ENABLED": "true"}) as urls:
+        yield urls
+
+
+async def _register(http: httpx.AsyncClient) -> tuple[str, str]:
+    name = f"t{uuid.uuid4().hex[:12]}"
+    resp = await http.post("/register", json={"email": f"{name}@example.com", "username": name, "password": "test-password"})
+    assert resp.status_code == 201, resp.text
+    user_id = resp.json()["id"]
+    return user_id, create_access_token(user_id)
+
+
+async def _next_message(ws, timeout: float = 10.0) -> dict:
+    while True:
+        event = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+        if event["type"] == "message" and event["message"]["text_content"] != "warm-up":
+            return event
+
+
+async def _wait_for_backplane(sender, receiver) -> None:
+    # Worker B's LISTEN connection comes up in the background after startup
+    for _ in range(20):
+        await sender.send(json.dumps({"type": "message", "text_content": "warm-up"}))
+        try:
+            while True:
+                event = json.loads(await asyncio.wait_for(receiver.recv(), 0.5))
+                if event["type"] == "message":
+                    return
+        except asyncio.TimeoutError:
+            continue
+    raise AssertionError("Backplane never delivered across workers")
+
+
+async def test_cross_worker_delivery(workers):
+    host_a, host_b = workers
+    async with httpx.AsyncClient(base_url=f"http://{host_a}") as http:
+        alice_id, alice_token = await _register(http)
+        bob_id, bob_token = await _register(http)
+        resp = await http.post("/chats", json={"user_ids": [bob_id]}, headers={"Authorization": f"Bearer {alice_token}"})
+        assert resp.status_code == 201, resp.text
+        chat_id = resp.json()["id"]
+
+    rng = random.Random(1)
+    texts = {
+        "j": "hello across workers",
+        # Over the NOTIFY limit as JSON, tiny once compressed
+        "z": "й" * 4000,
+        # Random CJK does not compress under the limit, so it is spilled
+        "r": "".join(chr(rng.randint(0x4E00, 0x9FFF)) for _ in range(4000)),
+    }
+
+    async with websockets.connect(f"ws://{host_b}/ws/chats/{chat_id}?token={bob_token}") as bob, websockets.connect(
+        f"ws://{host_a}/ws/chats/{chat_id}?token={alice_token}"
+    ) as alice:
+        await _wait_for_backplane(alice, bob)
+        for kind, text in texts.items():
+            await alice.send(json.dumps({"type": "message", "text_content": text}))
+            event = await _next_message(bob)
+            assert event["message"]["text_content"] == text, kind
+            assert event["message"]["from_user_id"] == alice_id
@@ -0,0 +1,30 @@
+"""Admission control in the password hashing pool."""
+import asyncio
+import threading
+
+import pytest
+
+from app.core.hashing import HashingPool, HashingPoolBusy
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_queue_timeout_does_not_leak_slots():
+    pool = HashingPool(workers=1, max_pending=10, queue_timeout=0.05)
+    release = threading.Event()
+    try:
+        # The only slot is busy, so every waiter times out
+        holder = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.01)
+        for _ in range(20):
+            with pytest.raises(HashingPoolBusy):
+                await pool.run(lambda: None)
+        release.set()
+        await holder
+        assert pool.rejected == 20 and pool.pending == 0
+        # Both runs below need the slot back; a leaked one would make the second time out
+        assert await pool.run(lambda: 1) == 1
+        assert await pool.run(lambda: 2) == 2
+    finally:
+        release.set()
+        pool.shutdown()
@@ -0,0 +1,84 @@
+"""Message full-text search: scoped to the caller's chats, paged by cursor, snippets HTML-escaped."""
+import uuid
+
+import pytest
+
+from tests.conftest import requires_db
+
+pytestmark = [pytest.mark.anyio, requires_db]
+
+
+@pytest.fixture
+def word() -> str:
+    # A term no other test (or seeded data) contains
+    return f"w{uuid.uuid4().hex[:16]}"
+
+
+async def _chat(client, owner, *others) -> str:
+    resp = await client.post("/chats", json={"user_ids": [u.id for u in others]}, headers=owner.headers)
+    assert resp.status_code == 201, resp.text
+    return resp.json()["id"]
+
+
+async def _send(client, user, chat_id: str, text: str) -> str:
+    resp = await client.post(f"/chats/{chat_id}/messages", json={"text_content": text}, headers=user.headers)
+    assert resp.status_code == 201, resp.text
+    return resp.json()["id"]
+
+
+async def test_only_my_chats(client, make_user, word):
+    alice, bob, carol = await make_user(), await make_user(), await make_user()
+    mine = await _chat(client, alice, bob)
+    theirs = await _chat(client, bob, carol)
+    expected = await _send(client, bob, mine, f"see {word} here")
+    await _send(client, bob, theirs, f"and {word} there")
+
+    resp = await client.get("/chats/search", params={"q": word}, headers=alice.headers)
+    assert resp.status_code == 200, resp.text
+    assert [hit["message"]["id"] for hit in resp.json()["items"]] == [expected]
+
+    resp = await client.get(f"/chats/{mine}/search", params={"q": word}, headers=alice.headers)
+    assert [hit["message"]["id"] for hit in resp.json()["items"]] == [expected]
+
+    resp = await client.get(f"/chats/{theirs}/search", params={"q": word}, headers=alice.headers)
+    assert resp.status_code == 404
+
+
+async def test_cursor_paging(client, make_user, word):
+    alice, bob, carol = await make_user(), await make_user(), await make_user()
+    direct = await _chat(client, alice, bob)
+    group = await _chat(client, alice, bob, carol)
+    sent = []
+    for i in range(5):
+        sent.append(await _send(client, bob, direct if i % 2 else group, f"{word} number {i}"))
+
+    seen, before = [], None
+    while True:
+        params = {"q": word, "limit": 2, **({"before": before} if before else {})}
+        resp = await client.get("/chats/search", params=params, headers=alice.headers)
+        assert resp.status_code == 200, resp.text
+        page = resp.json()
+        assert len(page["items"]) <= 2
+        seen += [hit["message"]["id"] for hit in page["items"]]
+        before = page["next_cursor"]
+        if before is None:
+            break
+    # Newest first, across both chats, each hit once
+    assert seen == sent[::-1]
+
+    resp = await client.get("/chats/search", params={"q": word, "before": "nope"}, headers=alice.headers)
+    assert resp.status_code == 400
+
+
+async def test_snippet_is_escaped(client, make_user, word):
+    alice, bob = await make_user(), await make_user()
+    chat_id = await _chat(client, alice, bob)
+    await _send(client, bob, chat_id, f'<img src=x onerror="alert(1)"> {word} & 1<2 <b>bold</b>')
+
+    resp = await client.get("/chats/search", params={"q": word}, headers=alice.headers)
+    [hit] = resp.json()["items"]
+    snippet = hit["snippet"]
+    assert f"<mark>{word}</mark>" in snippet
+    # The only markup is ours; whatever else survives ts_headline is escaped
+    assert "<" not in snippet.replace("<mark>", "").replace("</mark>", "")
+    assert "&amp;" in snippet and "1&lt;2" in snippet
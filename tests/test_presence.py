@@ -0,0 +1,75 @@
+"""Presence fan-out and last_seen persistence."""
+import asyncio
+import uuid
+
+import pytest
+
+from app.realtime import frames
+from app.realtime.backplane import Backplane
+from app.realtime.manager import ChatConnectionManager
+from tests.conftest import requires_db
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeWebSocket:
+    scope: dict = {}
+
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+
+    async def accept(self, subprotocol=None) -> None:
+        return None
+
+    async def send_text(self, data: str) -> None:
+        self.sent.append(data)
+
+
+class RecordingBackplane(Backplane):
+    def __init__(self) -> None:
+        self.published: list[tuple[uuid.UUID, str]] = []
+
+    async def start(self, deliver) -> None:
+        return None
+
+    async def stop(self) -> None:
+        return None
+
+    async def publish(self, chat_id: uuid.UUID, data: str) -> None:
+        self.published.append((chat_id, data))
+
+
+async def test_one_frame_per_socket_across_workers():
+    alice, bob = uuid.uuid4(), uuid.uuid4()
+    chats = [uuid.uuid4(), uuid.uuid4(), uuid.uuid4()]
+    backplane = RecordingBackplane()
+    # Worker A holds alice's and bob's sockets; worker B holds another socket each
+    worker_a, worker_b = ChatConnectionManager(backplane), ChatConnectionManager(RecordingBackplane())
+    sockets = {}
+    for name, worker, user_id in (("a_alice", worker_a, alice), ("a_bob", worker_a, bob), ("b_alice", worker_b, alice), ("b_bob", worker_b, bob)):
+        sockets[name] = FakeWebSocket()
+        conn = await worker.accept(sockets[name], user_id)
+        for chat_id in chats:
+            worker.subscribe(chat_id, conn)
+
+    event = frames.event({"type": "presence", "user_id": alice, "status": "online"})
+    await worker_a.broadcast_to_chats(chats, event, exclude_user=alice)
+    # The other worker gets a single backplane event for all three chats
+    assert len(backplane.published) == 1
+    await worker_b.deliver_local(*backplane.published[0])
+    await asyncio.sleep(0.01)
+
+    assert sockets["a_bob"].sent == sockets["b_bob"].sent == [event.json]
+    assert sockets["a_alice"].sent == sockets["b_alice"].sent == []
+
+
+@requires_db
+async def test_me_shows_flushed_last_seen(client, make_user):
+    from app.realtime.presence import presence
+
+    user = await make_user()
+    before = (await client.get("/me", headers=user.headers)).json()["last_seen"]
+    presence.touch(uuid.UUID(user.id))
+    await presence.flush()
+    after = (await client.get("/me", headers=user.headers)).json()["last_seen"]
+    assert after is not None and after != before
@@ -0,0 +1,68 @@
+"""Statement and row budgets for the main read endpoints.
+
+A relationship switched back to eager loading, or a per-row lookup in a loop, shows up here as
+extra statements. Budgets count the user lookup and membership check, which are skipped when the
+in-process caches are warm.
+"""
+import pytest
+
+from app.core import profiler
+from tests.conftest import requires_db
+
+pytestmark = [pytest.mark.anyio, requires_db]
+
+GROUP_SIZE = 40
+
+
+def _rows(profile: profiler.Profile) -> int:
+    return sum(s.rows for s in profile.statements)
+
+
+@pytest.fixture
+async def direct_chat(client, make_user):
+    alice, bob = await make_user(), await make_user()
+    resp = await client.post("/chats", json={"user_ids": [bob.id]}, headers=alice.headers)
+    assert resp.status_code == 201, resp.text
+    chat_id = resp.json()["id"]
+    for i in range(3):
+        resp = await client.post(f"/chats/{chat_id}/messages", json={"text_content": f"hi {i}"}, headers=bob.headers)
+        assert resp.status_code == 201, resp.text
+    return alice, chat_id
+
+
+async def test_me(client, make_user, query_budget):
+    user = await make_user()
+    # user lookup
+    with query_budget(1) as profile:
+        resp = await client.get("/me", headers=user.headers)
+    assert resp.status_code == 200
+    assert _rows(profile) <= 1
+
+
+async def test_list_chats(client, direct_chat, make_user, query_budget):
+    alice, _ = direct_chat
+    # A large group on the same page: its members must not be loaded
+    others = [await make_user() for _ in range(GROUP_SIZE)]
+    resp = await client.post("/chats", json={"user_ids": [u.id for u in others], "name": "big"}, headers=alice.headers)
+    assert resp.status_code == 201, resp.text
+    resp = await client.post(f"/chats/{resp.json()['id']}/messages", json={"text_content": "hi all"}, headers=others[0].headers)
+    assert resp.status_code == 201, resp.text
+
+    # user, chat page, members of the page's direct chats, last messages
+    with query_budget(4, max_repeats=1) as profile:
+        resp = await client.get("/chats", headers=alice.headers)
+    assert resp.status_code == 200
+    assert [c["is_group"] for c in resp.json()["items"]] == [True, False]
+    # 1 user + 2 chats + 2 direct chat members + 2 last messages
+    assert _rows(profile) <= 7
+
+
+async def test_get_chat(client, direct_chat, query_budget):
+    alice, chat_id = direct_chat
+    # user, membership, chat, members with watermarks, one page of messages
+    with query_budget(5, max_repeats=1) as profile:
+        resp = await client.get(f"/chats/{chat_id}?limit=2", headers=alice.headers)
+    assert resp.status_code == 200
+    assert len(resp.json()["messages"]) == 2
+    # 1 user + 1 membership + 1 chat + 2 members + limit + 1 messages
+    assert _rows(profile) <= 8
@@ -0,0 +1,63 @@
+"""Read-your-writes across workers with a read replica.
+
+Needs a second database in TEST_DATABASE_REPLICA_URL, migrated to head and *not* replicating from
+DATABASE_URL: reads that reach it see none of the rows the test writes, which shows which database
+answered. Two uvicorn workers stand in for a multi-worker deployment.
+"""
+import os
+import uuid
+
+import httpx
+import pytest
+
+from app.core.security import create_access_token
+from app.db.replica import PIN_COOKIE
+from tests.conftest import requires_db, uvicorn_workers
+
+REPLICA_URL = os.environ.get("TEST_DATABASE_REPLICA_URL")
+
+pytestmark = [
+    pytest.mark.anyio,
+    requires_db,
+    pytest.mark.skipif(not REPLICA_URL, reason="TEST_DATABASE_REPLICA_URL is not set"),
+]
+
+
+@pytest.fixture(scope="module")
+def workers():
+    # A pin long enough to outlast the test
+    with uvicorn_workers({**os.environ, "DATABASE_REPLICA_URL": REPLICA_URL or "", "REPLICA_PIN_SECONDS": "60"}) as urls:
+        yield urls
+
+
+async def _register(http: httpx.AsyncClient) -> tuple[str, dict[str, str]]:
+    name = f"t{uuid.uuid4().hex[:12]}"
+    resp = await http.post("/register", json={"email": f"{name}@example.com", "username": name, "password": "test-password"})
+    assert resp.status_code == 201, resp.text
+    user_id = resp.json()["id"]
+    return user_id, {"Authorization": f"Bearer {create_access_token(user_id)}"}
+
+
+async def test_pin_cookie_follows_the_client(workers):
+    host_a, host_b = workers
+    async with httpx.AsyncClient(base_url=f"http://{host_a}") as a, httpx.AsyncClient(base_url=f"http://{host_b}") as b:
+        _, alice = await _register(a)
+        bob_id, bob = await _register(a)
+
+        resp = await a.post("/chats", json={"user_ids": [bob_id]}, headers=alice)
+        assert resp.status_code == 201, resp.text
+        cookie = resp.cookies.get(PIN_COOKIE)
+        assert cookie
+
+        # Worker B never saw the write: only the cookie sends alice's read to the primary
+        resp = await b.get("/chats", headers={**alice, "Cookie": f"{PIN_COOKIE}={cookie}"})
+        assert len(resp.json()["items"]) == 1
+        resp = await b.get("/chats", headers=alice)
+        assert resp.json()["items"] == []
+
+        # The cookie is bound to its user and signed
+        resp = await b.get("/chats", headers={**bob, "Cookie": f"{PIN_COOKIE}={cookie}"})
+        assert resp.json()["items"] == []
+        forged = cookie[:-1] + ("0" if cookie[-1] != "0" else "1")
+        resp = await b.get("/chats", headers={**alice, "Cookie": f"{PIN_COOKIE}={forged}"})
+        assert resp.json()["items"] == []
@@ -0,0 +1,49 @@
+"""User search over username and "first last" (search_name, kept by a trigger)."""
+import uuid
+
+import pytest
+
+from tests.conftest import requires_db
+
+pytestmark = [pytest.mark.anyio, requires_db]
+
+
+async def _register(client, first_name: str, last_name: str) -> str:
+    name = f"t{uuid.uuid4().hex[:12]}"
+    resp = await client.post(
+        "/register",
+        json={
+            "email": f"{name}@example.com",
+            "username": name,
+            "password": "test-password",
+            "first_name": first_name,
+            "last_name": last_name,
+        },
+    )
+    assert resp.status_code == 201, resp.text
+    return resp.json()["id"]
+
+
+@pytest.mark.parametrize("q", [" ", "   ", "\t"])
+async def test_blank_query_rejected(client, make_user, q):
+    user = await make_user()
+    resp = await client.get("/search", params={"q": q}, headers=user.headers)
+    assert resp.status_code == 422
+
+
+async def test_name_and_fuzzy(client, make_user):
+    user = await make_user()
+    # Unique made-up names, so other rows in the database do not interfere
+    first, last = f"Zq{uuid.uuid4().hex[:6]}", f"Xv{uuid.uuid4().hex[:6]}"
+    target = await _register(client, first, last)
+
+    for q in (first[:4], last.upper(), f"{first} {last[:3]}"):
+        resp = await client.get("/search", params={"q": q}, headers=user.headers)
+        assert [u["id"] for u in resp.json()["items"]] == [target], q
+
+    # One character off: only fuzzy mode tolerates it
+    typo = last[:-1] + ("a" if last[-1] != "a" else "b")
+    resp = await client.get("/search", params={"q": typo}, headers=user.headers)
+    assert resp.json()["items"] == []
+    resp = await client.get("/search", params={"q": typo, "mode": "fuzzy"}, headers=user.headers)
+    assert target in [u["id"] for u in resp.json()["items"]]
@@ -0,0 +1,38 @@
+"""Malformed inbound WebSocket frames get an error frame and leave the socket open.
+
+Membership is seeded into the in-process cache, so these run without a database.
+"""
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.security import create_access_token
+from app.main import app
+from app.services import membership
+
+
+def _reply(ws) -> dict:
+    # Skip broadcasts (presence and the like); the reply to our own frame is the next one addressed to us
+    while True:
+        frame = ws.receive_json()
+        if frame["type"] in ("error", "pong"):
+            return frame
+
+
+@pytest.fixture
+def chat():
+    user_id, chat_id = uuid.uuid4(), uuid.uuid4()
+    membership.remember(user_id, [chat_id])
+    return chat_id, create_access_token(str(user_id))
+
+
+@pytest.mark.parametrize("event_type", [[], {}, 1, None, "nope"])
+def test_unknown_event_type(chat, event_type):
+    chat_id, token = chat
+    with TestClient(app).websocket_connect(f"/ws/chats/{chat_id}?token={token}") as ws:
+        ws.send_json({"type": event_type})
+        assert _reply(ws) == {"type": "error", "error": "Unknown event type"}
+        # Still serving: the next frame is answered too
+        ws.send_json({"type": "ping"})
+        assert _reply(ws) == {"type": "pong"}